@@ -0,0 +1,70 @@
+"""Compare thread, process and shared memory pools for the transmission of a Wire3D.
+
+Every configuration runs in its own process, which builds the wire and
+calculates the transmission at the same energies with
+:meth:`~garn.system_wide.Wire.transmission`. The throughput in energies
+per second and the peak resident memory of the process together with
+its worker processes are printed.
+
+    python benchmarks/executors.py [base] [wire_length] [number_of_points] [workers]
+
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+import garn
+from garn.energy_grid import EnergyGrid
+
+
+def run(executor, workers, base, wire_length, number_of_points):
+    os.chdir(tempfile.mkdtemp())
+    wire = garn.Wire3D(base=base, wire_length=wire_length, lead_length=5,
+                       identifier="bench-" + executor, start_bottom=True,
+                       end_bottom=True)
+    energies = EnergyGrid(0.5, 1.5, number_of_points)
+
+    start = time.time()
+    wire.transmission(energies=energies, print_to_commandline=False,
+                      workers=workers, executor=executor)
+    seconds = time.time() - start
+    # ru_maxrss is in kilobytes on Linux. The children are the worker
+    # processes, counted as if all reached the largest peak.
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+            workers * resource.getrusage(
+                resource.RUSAGE_CHILDREN).ru_maxrss) / 1024.0
+    return len(energies) / seconds, peak, wire.transmission_data
+
+
+def main():
+    base = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    wire_length = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    number_of_points = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for executor, n in [("thread", 1), ("thread", workers),
+                        ("process", workers), ("shared", workers)]:
+        with context.Pool(1) as pool:
+            results[executor, n] = pool.apply(
+                run, (executor, n, base, wire_length, number_of_points))
+        throughput, peak, transmission = results[executor, n]
+        print("{:8s} {:3d} workers {:8.2f} energies/s {:8.1f} MB peak".format(
+            executor, n, throughput, peak))
+
+    difference = max(abs(a - b) for a, b in
+                     zip(results["thread", workers][2],
+                         results["process", workers][2]))
+    print("largest transmission difference: {:.2e}".format(difference))
+
+
+if __name__ == "__main__":
+    main()
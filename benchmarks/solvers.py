@@ -0,0 +1,64 @@
+"""Compare the "smatrix" and "greens_function" transmission solvers.
+
+Every solver runs in its own process, which builds a Wire3D with all
+eight leads and calculates the transmission at a few energies. The
+solve time per energy and the peak resident memory of the process are
+printed.
+
+    python benchmarks/solvers.py [base] [wire_length] [number_of_points]
+
+"""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                "..")))
+
+import garn
+from garn.energy_grid import EnergyGrid
+
+
+def run(solver, base, wire_length, number_of_points):
+    wire = garn.Wire3D(base=base, wire_length=wire_length, lead_length=5,
+                       identifier="bench-" + solver, start_bottom=True,
+                       end_bottom=True)
+    wire.solver = solver
+    energies = EnergyGrid(0.5, 1.5, number_of_points)
+    in_leads, out_leads = wire._in_out_nums()
+
+    start = time.time()
+    transmission = [wire._calculate_transmission(en, in_leads, out_leads)
+                    for en in energies]
+    seconds = (time.time() - start) / len(energies)
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return seconds, peak, transmission
+
+
+def main():
+    base = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    wire_length = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    number_of_points = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for solver in ["smatrix", "greens_function"]:
+        with context.Pool(1) as pool:
+            results[solver] = pool.apply(run, (solver, base, wire_length,
+                                               number_of_points))
+        seconds, peak, transmission = results[solver]
+        print("{:16s} {:8.3f} s/energy {:8.1f} MB peak".format(
+            solver, seconds, peak))
+
+    difference = max(abs(a - b) for a, b in
+                     zip(results["smatrix"][2],
+                         results["greens_function"][2]))
+    print("largest transmission difference: {:.2e}".format(difference))
+
+
+if __name__ == "__main__":
+    main()
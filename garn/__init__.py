@@ -82,3 +82,6 @@ from garn.wire_3d import Wire3D
 from garn.wire_2D import Wire2D
 
 
+from garn.scaling import estimate_cost
+
+
@@ -0,0 +1,167 @@
+"""Continuum limit of transmission steps from coarse discretizations.
+
+The discretization error of the finite difference Hamiltonian used by
+garn is of order :math:`step\\_length^2`. The energy of every step in the
+transmission therefore behaves as
+
+.. math::
+
+    E_n(h) = E_n(0) + c_1 h^2 + c_2 h^4 + \\dots
+
+for step length h. :func:`richardson_thresholds` calculates the same
+wire for a few coarse step lengths in parallel, locates the steps and
+extrapolates their energies to h = 0, which is far cheaper than one
+calculation with a small step length.
+
+.. code-block:: Python
+
+    result = garn.convergence.richardson_thresholds(
+        dict(base=3, wire_length=30, lead_length=5), [1, 0.75, 0.5],
+        start_energy=0, end_energy=3, number_of_points=300, workers=3)
+    result["extrapolated"]
+
+"""
+
+import multiprocessing
+
+import numpy as np
+
+import garn
+from garn.energy_grid import EnergyGrid
+
+
+def step_positions(energies, transmission_data, number_of_steps=None):
+    """Energies where the transmission first rises past n - 1/2.
+
+    Parameters
+    ----------
+    energies : list of float
+        Sorted energies.
+    transmission_data : list of float
+    number_of_steps : int, optional
+        Number of steps to locate. Defaults to all steps found.
+
+    Returns
+    -------
+    numpy.ndarray
+        Energy of step n = 1, 2, ... found by linear interpolation, NaN
+        for steps outside the calculated energies when
+        `number_of_steps` is given.
+
+    """
+    energies = np.asarray(energies, dtype=float)
+    transmission = np.asarray(transmission_data, dtype=float)
+    if number_of_steps is None:
+        number_of_steps = max(int(np.floor(transmission.max() + 0.5)), 0) \
+            if len(transmission) else 0
+
+    positions = np.full(number_of_steps, np.nan)
+    for n in range(1, number_of_steps + 1):
+        above = np.nonzero(transmission >= n - 0.5)[0]
+        if len(above) == 0 or above[0] == 0:
+            continue
+        i = above[0]
+        fraction = ((n - 0.5 - transmission[i - 1]) /
+                    (transmission[i] - transmission[i - 1]))
+        positions[n - 1] = (energies[i - 1] +
+                            fraction * (energies[i] - energies[i - 1]))
+    return positions
+
+
+def _transmission(wire_class, wire_params, step_length, energies):
+    wire = getattr(garn, wire_class)(step_length=step_length, **wire_params)
+    in_leads, out_leads = wire._in_out_nums()
+    return [wire._calculate_transmission(energy, in_leads, out_leads)
+            for energy in energies]
+
+
+def richardson_thresholds(wire_params, step_lengths, start_energy,
+                          end_energy, number_of_points=500, workers=None,
+                          wire_class="Wire3D", number_of_steps=None):
+    """Extrapolate transmission step energies to the continuum.
+
+    Parameters
+    ----------
+    wire_params : dict
+        Keyword arguments of the wire, without `step_length`. The sizes
+        are in physical units, so every step length describes the same
+        wire. Choose step lengths that divide the sizes, otherwise the
+        sizes are rounded differently for every step length.
+    step_lengths : list of float
+        At least two step lengths. With two the :math:`h^2` term is
+        eliminated, with more the series in :math:`h^2` is fitted by
+        least squares up to order len(`step_lengths`) - 1, at most
+        :math:`h^4`.
+    start_energy, end_energy : float
+    number_of_points : int, optional
+        Points of the :class:`~garn.energy_grid.EnergyGrid` calculated
+        for every step length.
+    workers : int, optional
+        Number of processes, defaults to one per step length.
+    wire_class : str, optional
+        "Wire3D" or "Wire2D".
+    number_of_steps : int, optional
+        Number of steps to extrapolate, defaults to the steps found at the
+        smallest step length.
+
+    Returns
+    -------
+    dict
+        `step_lengths`, `energies`, `transmission` (one list per step
+        length), `thresholds` (array with one row per step length) and
+        `extrapolated` step energies. Steps not found for every step
+        length are NaN.
+
+    """
+    if len(step_lengths) < 2:
+        raise ValueError("Richardson extrapolation needs two or more "
+                         "step lengths")
+    energies = list(EnergyGrid(start_energy, end_energy, number_of_points))
+    tasks = [(wire_class, wire_params, step_length, energies)
+             for step_length in step_lengths]
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers or len(step_lengths)) as pool:
+        transmission = pool.starmap(_transmission, tasks)
+
+    if number_of_steps is None:
+        finest = int(np.argmin(step_lengths))
+        number_of_steps = len(step_positions(energies,
+                                             transmission[finest]))
+    thresholds = np.array([step_positions(energies, data, number_of_steps)
+                           for data in transmission])
+
+    return {"step_lengths": list(step_lengths), "energies": energies,
+            "transmission": transmission, "thresholds": thresholds,
+            "extrapolated": extrapolate_thresholds(step_lengths,
+                                                   thresholds)}
+
+
+def extrapolate_thresholds(step_lengths, thresholds):
+    """Step energies at step length 0.
+
+    Fits :math:`E(h) = E(0) + c_1 h^2 + c_2 h^4` to every step, see
+    :func:`richardson_thresholds`.
+
+    Parameters
+    ----------
+    step_lengths : list of float
+    thresholds : numpy.ndarray
+        One row of step energies per step length.
+
+    Returns
+    -------
+    numpy.ndarray
+        E(0) of every step, NaN for steps with a NaN threshold.
+
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    h2 = np.asarray(step_lengths, dtype=float) ** 2
+    order = min(len(step_lengths) - 1, 2)
+    design = np.vander(h2, order + 1, increasing=True)
+    extrapolated = np.full(thresholds.shape[1], np.nan)
+    for n in range(thresholds.shape[1]):
+        if not np.any(np.isnan(thresholds[:, n])):
+            coefficients = np.linalg.lstsq(design, thresholds[:, n],
+                                           rcond=None)[0]
+            extrapolated[n] = coefficients[0]
+    return extrapolated
@@ -0,0 +1,247 @@
+"""SQLite store of calculated wires and transmissions.
+
+Every wire is stored once with the values of
+:attr:`~garn.system_wide.Wire.parameters_names` and every calculated
+point is stored with the wire it belongs to and its energy. Both are
+indexed so that questions like "have we already calculated base=5,
+wire_length=200 with side leads?" are answered by a query instead of
+grepping data files.
+
+.. code-block:: Python
+
+    db = garn.database.ResultsDatabase("results.db")
+    db.insert(wire)
+    db.find_wires(base=5, wire_length=200, start_right=True)
+    db.query(0.5, 0.7, base=5)
+    wire = garn.Wire3D(database="results.db", identifier="test-3D")
+
+"""
+
+import sqlite3
+
+_LEADS = ["start_top", "start_right", "start_left", "start_bottom",
+          "end_top", "end_right", "end_left", "end_bottom"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS wires (
+    id INTEGER PRIMARY KEY,
+    wire_class TEXT NOT NULL,
+    identifier TEXT NOT NULL UNIQUE,
+    t REAL NOT NULL,
+    base INTEGER NOT NULL,
+    wire_length INTEGER NOT NULL,
+    lead_length INTEGER NOT NULL,
+    start_top INTEGER NOT NULL,
+    start_right INTEGER NOT NULL,
+    start_left INTEGER NOT NULL,
+    start_bottom INTEGER NOT NULL,
+    end_top INTEGER NOT NULL,
+    end_right INTEGER NOT NULL,
+    end_left INTEGER NOT NULL,
+    end_bottom INTEGER NOT NULL,
+    shape TEXT
+);
+CREATE INDEX IF NOT EXISTS wires_geometry
+    ON wires (base, wire_length, lead_length, t);
+CREATE TABLE IF NOT EXISTS points (
+    wire_id INTEGER NOT NULL REFERENCES wires (id),
+    energy REAL NOT NULL,
+    transmission REAL NOT NULL,
+    PRIMARY KEY (wire_id, energy)
+);
+CREATE INDEX IF NOT EXISTS points_energy ON points (energy);
+"""
+
+
+class ResultsDatabase(object):
+    """Results of transmission calculations in the SQLite file `file_name`.
+
+    Parameters
+    ----------
+    file_name : str
+        Created with the needed tables if it does not exist.
+
+    """
+
+    # shape is NULL for wires without a cross-section, like Wire2D.
+    parameters_names = ["identifier", "t", "base", "wire_length",
+                        "lead_length"] + _LEADS + ["shape"]
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.connection = sqlite3.connect(file_name)
+        self.connection.executescript(_SCHEMA)
+        columns = [row[1] for row in
+                   self.connection.execute("PRAGMA table_info(wires)")]
+        if "shape" not in columns:
+            # database created before cross-sections were stored
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE wires ADD COLUMN shape TEXT")
+                self.connection.execute(
+                    "UPDATE wires SET shape = 'hexagon'"
+                    " WHERE wire_class = 'Wire3D'")
+
+    def close(self):
+        self.connection.close()
+
+    def _wire_row(self, wire):
+        return ((wire.__class__.__name__,) +
+                tuple(getattr(wire, name) for name in
+                      ["identifier", "t", "base", "wire_length",
+                       "lead_length"]) +
+                tuple(int(bool(lead)) for lead in wire.leads) +
+                (getattr(wire, "shape", None),))
+
+    def add_wire(self, wire):
+        """Store the parameters of `wire` and return its id.
+
+        Raises
+        ------
+        ValueError
+            If another wire with the same identifier but different
+            parameters is already stored.
+
+        """
+        row = self._wire_row(wire)
+        stored = self.connection.execute(
+            "SELECT id, wire_class, " + ", ".join(self.parameters_names) +
+            " FROM wires WHERE identifier = ?", (wire.identifier,)
+        ).fetchone()
+        if stored is not None:
+            if tuple(stored[1:]) != row:
+                raise ValueError("A different wire with identifier " +
+                                 wire.identifier + " is already stored in " +
+                                 self.file_name)
+            return stored[0]
+
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO wires (wire_class, " +
+                ", ".join(self.parameters_names) + ") VALUES (" +
+                ", ".join("?" * len(row)) + ")", row)
+        return cursor.lastrowid
+
+    def insert(self, wire, energies=None, transmission_data=None):
+        """Store `wire` and its calculated points in one transaction.
+
+        Parameters
+        ----------
+        wire : :class:`~garn.Wire2D` or :class:`~garn.Wire3D`
+        energies, transmission_data : list of float, optional
+            Points to store. Defaults to `wire.energies` and
+            `wire.transmission_data`. Points already stored for the same
+            energy are replaced.
+
+        """
+        if energies is None:
+            energies = wire.energies
+            transmission_data = wire.transmission_data
+        wire_id = self.add_wire(wire)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?)",
+                ((wire_id, float(energy), float(transmission))
+                 for energy, transmission in zip(energies,
+                                                 transmission_data)))
+
+    def insert_many(self, wires):
+        """Store several wires, for example the result of a sweep."""
+        for wire in wires:
+            self.insert(wire)
+
+    def _where(self, parameters):
+        conditions = []
+        values = []
+        for name, value in sorted(parameters.items()):
+            if name not in self.parameters_names + ["wire_class"]:
+                raise ValueError("Unknown wire parameter " + name)
+            if name in _LEADS:
+                value = int(bool(value))
+            conditions.append("wires." + name + " = ?")
+            values.append(value)
+        return conditions, values
+
+    def find_wires(self, **parameters):
+        """Stored wires matching all keyword arguments.
+
+        Keyword arguments are names in :attr:`parameters_names` or
+        "wire_class".
+
+        Returns
+        -------
+        list of dict
+            One dictionary of parameters per wire.
+
+        """
+        conditions, values = self._where(parameters)
+        sql = ("SELECT wire_class, " + ", ".join(self.parameters_names) +
+               " FROM wires")
+        if conditions:
+            sql = sql + " WHERE " + " AND ".join(conditions)
+        wires = []
+        for row in self.connection.execute(sql + " ORDER BY id", values):
+            wire = dict(zip(["wire_class"] + self.parameters_names, row))
+            for lead in _LEADS:
+                wire[lead] = bool(wire[lead])
+            wires.append(wire)
+        return wires
+
+    def query(self, start_energy=None, end_energy=None, **parameters):
+        """Stored points in [`start_energy`, `end_energy`].
+
+        Keyword arguments select wires as in :meth:`find_wires`.
+
+        Returns
+        -------
+        list of (str, float, float)
+            Identifier, energy and transmission sorted by identifier and
+            energy.
+
+        """
+        conditions, values = self._where(parameters)
+        if start_energy is not None:
+            conditions.append("points.energy >= ?")
+            values.append(start_energy)
+        if end_energy is not None:
+            conditions.append("points.energy <= ?")
+            values.append(end_energy)
+        sql = ("SELECT wires.identifier, points.energy, points.transmission"
+               " FROM points JOIN wires ON points.wire_id = wires.id")
+        if conditions:
+            sql = sql + " WHERE " + " AND ".join(conditions)
+        return self.connection.execute(
+            sql + " ORDER BY wires.identifier, points.energy",
+            values).fetchall()
+
+    def load(self, wire, identifier):
+        """Set the attributes of `wire` from the stored wire `identifier`.
+
+        Used by :class:`~garn.Wire2D` and :class:`~garn.Wire3D` when
+        created with the `database` parameter.
+
+        Raises
+        ------
+        KeyError
+            If no wire with `identifier` is stored.
+
+        """
+        wires = self.find_wires(identifier=identifier)
+        if not wires:
+            raise KeyError("No wire with identifier " + identifier +
+                           " in " + self.file_name)
+        stored = wires[0]
+        wire.identifier = stored["identifier"]
+        wire.t = stored["t"]
+        wire.base = stored["base"]
+        wire.wire_length = stored["wire_length"]
+        wire.lead_length = stored["lead_length"]
+        wire.leads = [stored[lead] for lead in _LEADS]
+        if stored["shape"] is not None:
+            wire.shape = stored["shape"]
+
+        wire.energies = []
+        wire.transmission_data = []
+        for name, energy, transmission in self.query(identifier=identifier):
+            wire.energies.append(energy)
+            wire.transmission_data.append(transmission)
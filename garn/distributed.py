@@ -0,0 +1,389 @@
+"""Distributed transmission sweeps over a shared filesystem.
+
+A sweep is split into chunks of energies that are written as task
+files to a queue directory on a filesystem shared by all nodes. Any
+number of workers, on any number of nodes, claim chunks by creating
+lock files, calculate the transmission and write one result file per
+chunk. When all chunks are done :meth:`WorkQueue.merge` collects the
+results into the ordinary "data-" + identifier files.
+
+.. code-block:: Python
+
+    queue = garn.distributed.WorkQueue("/shared/sweep")
+    queue.submit("Wire3D", dict(base=3, wire_length=30, lead_length=5,
+                                identifier="sweep-3D"),
+                 start_energy=0, end_energy=1, number_of_points=1000)
+
+On every node run
+
+.. code-block:: bash
+
+    python -m garn.distributed /shared/sweep
+
+and finally on any node
+
+.. code-block:: Python
+
+    queue.merge()
+
+Geometry sweeps are made by submitting several wires, with different
+identifiers, to the same queue. Submitting an identifier again replaces
+its chunks and drops their results. Workers refresh the locks of their
+chunks from a background thread, and a lock that has not been touched
+for `stale_after` seconds belongs to a dead worker and the chunk is
+claimed again by the next worker that finds it. Workers keep polling
+while chunks are locked by others, so one of them picks up the chunk of
+a worker that died.
+
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+import garn
+from garn.energy_grid import EnergyGrid
+from garn.serialization import format_header, format_point
+
+
+def _write_json(file_name, content):
+    """Write `content` to `file_name` so readers never see half a file."""
+    tmp_name = file_name + ".tmp-" + str(os.getpid())
+    with open(tmp_name, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp_name, file_name)
+
+
+def _read_json(file_name):
+    with open(file_name, "r") as f:
+        return json.load(f)
+
+
+class WorkQueue(object):
+    """Queue of energy chunks stored in the directory `directory`.
+
+    Parameters
+    ----------
+    directory : str
+        Directory on a filesystem shared by all workers. Created if it
+        does not exist.
+    stale_after : int or float, optional
+        Seconds after which a lock that has not been refreshed is
+        considered abandoned by a dead worker.
+
+    Notes
+    -----
+    The directory contains the subdirectories "tasks", "locks" and
+    "results" with one file per chunk in each. Chunks are named by
+    identifier, index and a hash of the task, so a result is only ever
+    used for the task it was calculated for. Calculating a chunk twice
+    gives the same result file, so a chunk claimed by two workers after
+    a stale lock is reclaimed only costs duplicate work.
+
+    """
+
+    def __init__(self, directory, stale_after=600):
+        self.directory = directory
+        self.stale_after = stale_after
+        for sub in ("tasks", "locks", "results"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    def _path(self, sub, chunk):
+        return os.path.join(self.directory, sub, chunk + ".json")
+
+    def _chunks(self):
+        return sorted(name[:-len(".json")] for name in
+                      os.listdir(os.path.join(self.directory, "tasks"))
+                      if name.endswith(".json"))
+
+    def _remove(self, chunk):
+        for sub in ("tasks", "locks", "results"):
+            try:
+                os.remove(self._path(sub, chunk))
+            except FileNotFoundError:
+                pass
+
+    def submit(self, wire_class, wire_parameters, start_energy=None,
+               end_energy=None, number_of_points=500, energies=None,
+               chunk_size=20):
+        """Split a transmission calculation into chunks and queue them.
+
+        Chunks queued before for the same identifier are removed with
+        their locks and results.
+
+        Parameters
+        ----------
+        wire_class : str
+            "Wire3D" or "Wire2D".
+        wire_parameters : dict
+            Keyword arguments used to create the wire. Must contain a
+            unique "identifier".
+        start_energy, end_energy : float, optional
+            Intervall calculated with `number_of_points` points just as in
+            :meth:`~garn.system_wide.Wire.transmission`.
+        number_of_points : int, optional
+        energies : :class:`~garn.energy_grid.EnergyGrid` or list of float, optional
+            Energies to calculate, used instead of the intervall if given.
+        chunk_size : int, optional
+            Number of energies in every chunk.
+
+        Returns
+        -------
+        int
+            Number of chunks submitted.
+
+        """
+        if energies is None:
+            energies = EnergyGrid(start_energy, end_energy, number_of_points)
+        energies = list(energies)
+
+        identifier = wire_parameters["identifier"]
+        for chunk in self._chunks():
+            try:
+                task = _read_json(self._path("tasks", chunk))
+            except FileNotFoundError:
+                continue
+            if task["wire_parameters"]["identifier"] == identifier:
+                self._remove(chunk)
+
+        chunks = 0
+        for first in range(0, len(energies), chunk_size):
+            task = {"wire_class": wire_class,
+                    "wire_parameters": wire_parameters,
+                    "energies": list(energies[first:first + chunk_size])}
+            digest = hashlib.sha1(json.dumps(task, sort_keys=True)
+                                  .encode()).hexdigest()[:12]
+            task["chunk"] = "{}-{:06d}-{}".format(identifier, chunks,
+                                                  digest)
+            self._remove(task["chunk"])
+            _write_json(self._path("tasks", task["chunk"]), task)
+            chunks = chunks + 1
+        return chunks
+
+    def _is_stale(self, lock):
+        try:
+            return time.time() - os.path.getmtime(lock) > self.stale_after
+        except FileNotFoundError:
+            return False
+
+    def claim(self, worker_id):
+        """Claim the next chunk without result and lock.
+
+        Returns
+        -------
+        dict or None
+            The task, or None if every chunk is done or locked by a
+            live worker.
+
+        """
+        for chunk in self._chunks():
+            if os.path.exists(self._path("results", chunk)):
+                continue
+            lock = self._path("locks", chunk)
+            if self._is_stale(lock):
+                # Move the stale lock away so it can be taken below. This
+                # is not atomic with the check: a worker that found the
+                # lock stale earlier can move away a fresh lock taken
+                # since, so two workers may end up calculating the chunk.
+                # They write the same result, see the class notes.
+                try:
+                    os.rename(lock, lock + ".stale-" + worker_id)
+                    os.remove(lock + ".stale-" + worker_id)
+                except FileNotFoundError:
+                    pass
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(worker_id)
+            try:
+                return _read_json(self._path("tasks", chunk))
+            except FileNotFoundError:
+                # Replaced by a new submit since the listing.
+                os.remove(lock)
+        return None
+
+    def heartbeat(self, task):
+        """Mark the lock of `task` as held by a live worker."""
+        try:
+            os.utime(self._path("locks", task["chunk"]))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, task, parameters, transmission_data):
+        """Store the result of `task` and release its lock.
+
+        Parameters
+        ----------
+        task : dict
+            As returned by :meth:`claim`.
+        parameters : list of (str, value)
+            Parameter names and values of the wire, written as the header
+            of the merged data file.
+        transmission_data : list of float
+            Transmission for every energy in the task.
+
+        """
+        _write_json(self._path("results", task["chunk"]),
+                    {"parameters": parameters,
+                     "energies": task["energies"],
+                     "transmission_data": transmission_data})
+        try:
+            os.remove(self._path("locks", task["chunk"]))
+        except FileNotFoundError:
+            pass
+
+    def done(self):
+        """True if every chunk in the queue has a result."""
+        return all(os.path.exists(self._path("results", chunk))
+                   for chunk in self._chunks())
+
+    def merge(self, directory="."):
+        """Merge chunk results into "data-" + identifier files.
+
+        Parameters
+        ----------
+        directory : str, optional
+            Where the data files are written.
+
+        Returns
+        -------
+        list of str
+            Names of the written data files.
+
+        Raises
+        ------
+        RuntimeError
+            If some chunk has not been calculated yet.
+
+        """
+        if not self.done():
+            raise RuntimeError("Not all chunks in " + self.directory +
+                               " are calculated")
+
+        wires = {}
+        for chunk in self._chunks():
+            task = _read_json(self._path("tasks", chunk))
+            result = _read_json(self._path("results", chunk))
+            identifier = task["wire_parameters"]["identifier"]
+            header, points = wires.setdefault(identifier,
+                                              (result["parameters"], []))
+            points.extend(zip(result["energies"],
+                              result["transmission_data"]))
+
+        file_names = []
+        for identifier, (header, points) in sorted(wires.items()):
+            names = [name for name, value in header]
+            values = [value for name, value in header]
+            file_name = os.path.join(directory, "data-" + identifier)
+            with open(file_name, "w") as f:
+                f.write(format_header(names, values))
+                for energy, transmission in sorted(points):
+                    f.write(format_point(energy, transmission))
+            file_names.append(file_name)
+        return file_names
+
+
+def _keep_alive(queue, task, stop, interval):
+    while not stop.wait(interval):
+        queue.heartbeat(task)
+
+
+def run_worker(directory, worker_id=None, stale_after=600,
+               poll_interval=10):
+    """Calculate chunks from the queue in `directory` until all are done.
+
+    Wires are created once per worker and reused for every chunk
+    belonging to them. While the remaining chunks are locked by other
+    workers the queue is checked again every `poll_interval` seconds,
+    until they are done or their locks turn stale. The lock of the chunk
+    being calculated is refreshed from a background thread every
+    `stale_after` / 4 seconds, so `stale_after` does not have to exceed
+    the time needed for one energy.
+
+    Parameters
+    ----------
+    directory : str
+        Queue directory, see :class:`WorkQueue`.
+    worker_id : str, optional
+        Name written to the locks. Defaults to host name and process id.
+    stale_after : int or float, optional
+        See :class:`WorkQueue`.
+    poll_interval : int or float, optional
+        Seconds to wait before looking for a chunk again.
+
+    Returns
+    -------
+    int
+        Number of chunks calculated by this worker.
+
+    """
+    if worker_id is None:
+        worker_id = socket.gethostname() + "-" + str(os.getpid())
+    queue = WorkQueue(directory, stale_after)
+    wires = {}
+    calculated = 0
+    while True:
+        task = queue.claim(worker_id)
+        if task is None:
+            if queue.done():
+                return calculated
+            time.sleep(poll_interval)
+            continue
+
+        key = json.dumps([task["wire_class"], task["wire_parameters"]],
+                         sort_keys=True)
+        if key not in wires:
+            wire_class = getattr(garn, task["wire_class"])
+            wires[key] = wire_class(**task["wire_parameters"])
+        wire = wires[key]
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_keep_alive,
+                                args=(queue, task, stop, stale_after / 4.0))
+        beat.daemon = True
+        beat.start()
+        try:
+            in_leads, out_leads = wire._in_out_nums()
+            transmission_data = []
+            for energy in task["energies"]:
+                transmission_data.append(
+                    wire._calculate_transmission(energy, in_leads,
+                                                 out_leads))
+        finally:
+            stop.set()
+            beat.join()
+
+        queue.complete(task, list(zip(wire.parameters_names,
+                                      wire.parameters_values)),
+                       transmission_data)
+        calculated = calculated + 1
+
+
+def run_local(directory, processes=2, stale_after=600, poll_interval=10):
+    """Work through the queue with local processes standing in for nodes.
+
+    `stale_after` and `poll_interval` are passed to :func:`run_worker`.
+
+    Returns
+    -------
+    int
+        Number of chunks calculated by all processes together.
+
+    """
+    with multiprocessing.Pool(processes) as pool:
+        results = [pool.apply_async(run_worker,
+                                    (directory, "local-" + str(i),
+                                     stale_after, poll_interval))
+                   for i in range(processes)]
+        return sum(result.get() for result in results)
+
+
+if __name__ == "__main__":
+    run_worker(sys.argv[1])
@@ -0,0 +1,127 @@
+"""Canonical grids of energies.
+
+The energy of point `i` on a regular grid is calculated directly as
+
+.. math::
+
+    start\\_energy + (end\\_energy - start\\_energy) \\cdot i / number\\_of\\_points
+
+instead of by adding up steps, so the same point on two grids (for
+example point 3 of 10 and point 6 of 20 on [0, 1)) is the same float.
+Sweeps, caches and checkpoints can therefore compare energies exactly
+and key on the grid or on the index of a point in it.
+"""
+
+import hashlib
+
+import numpy as np
+
+
+class EnergyGrid(object):
+    """Energies at which the transmission is calculated.
+
+    Either a regular grid of `number_of_points` equidistant energies on
+    the intervall [`start_energy`, `end_energy`), or the arbitrary
+    energies in `energies`.
+
+    Parameters
+    ----------
+    start_energy : float, optional
+    end_energy : float, optional
+    number_of_points : int, optional
+    energies : array_like of float, optional
+        Used instead of the intervall if given. Sorted and made unique.
+
+    Examples
+    --------
+    >>> grid = EnergyGrid(0, 1, 10)
+    >>> grid[3]
+    0.3
+    >>> grid.index(0.3)
+    3
+    >>> EnergyGrid(0, 1, 20)[6] == grid[3]
+    True
+
+    """
+
+    def __init__(self, start_energy=None, end_energy=None,
+                 number_of_points=500, energies=None):
+        if energies is not None:
+            self.regular = False
+            self.energies = np.unique(np.asarray(energies, dtype=float))
+            self._indices = dict((energy, i) for i, energy in
+                                 enumerate(self.energies.tolist()))
+        else:
+            self.regular = True
+            self.start_energy = float(start_energy)
+            self.end_energy = float(end_energy)
+            self.number_of_points = int(number_of_points)
+            self.energies = (self.start_energy +
+                             (self.end_energy - self.start_energy) *
+                             np.arange(self.number_of_points) /
+                             self.number_of_points)
+
+    def __len__(self):
+        return len(self.energies)
+
+    def __iter__(self):
+        return iter(self.energies.tolist())
+
+    def __getitem__(self, i):
+        return float(self.energies[i])
+
+    def index(self, energy):
+        """Index of `energy` in the grid.
+
+        Raises
+        ------
+        KeyError
+            If `energy` is not exactly a point of the grid.
+
+        """
+        if not self.regular:
+            return self._indices[float(energy)]
+
+        length = self.end_energy - self.start_energy
+        i = int(round((energy - self.start_energy) * self.number_of_points /
+                      length)) if length != 0 else 0
+        if 0 <= i < len(self) and self.energies[i] == energy:
+            return i
+        raise KeyError(energy)
+
+    def __contains__(self, energy):
+        try:
+            self.index(energy)
+        except KeyError:
+            return False
+        return True
+
+    def refined(self):
+        """Regular grid with the midpoints added, twice as many points."""
+        if not self.regular:
+            raise ValueError("Only regular grids can be refined")
+        return EnergyGrid(self.start_energy, self.end_energy,
+                          2 * self.number_of_points)
+
+    def key(self):
+        """Hashable description identifying the grid exactly."""
+        if self.regular:
+            return ("regular", self.start_energy, self.end_energy,
+                    self.number_of_points)
+        return ("energies",
+                hashlib.sha1(self.energies.tobytes()).hexdigest())
+
+    def __eq__(self, other):
+        return isinstance(other, EnergyGrid) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        if self.regular:
+            return "EnergyGrid({!r}, {!r}, {!r})".format(
+                self.start_energy, self.end_energy, self.number_of_points)
+        return "EnergyGrid(energies=<{} points>)".format(len(self))
@@ -1,8 +1,10 @@
+from functools import lru_cache
 from math import sqrt
 
+import numpy as np
+
 
 # 3D
-sqrt3 = 17 / 10.0
 def hexagon(pos, base):
     """ Find out if position is inside hexagon
     Hexagon with left down corner in (0,0)
@@ -18,6 +20,111 @@ def hexagon(pos, base):
         return False
 
 
+# Cross-sections
+#
+# A cross-section is a function of the coordinates x and z (arrays) and
+# a size returning a boolean array telling which points are inside. The
+# functions are evaluated once for all lattice points by
+# cross_section_mask and the result is cached.
+
+shapes = {}
+
+
+@lru_cache(maxsize=None)
+def cross_section_mask(shape, size, step_length=1):
+    """ Lattice points of a cross-section
+
+    The registered cross-section `shape` is evaluated once for all
+    lattice points (x, z) and the result is cached per
+    (`shape`, `size`, `step_length`).
+
+    shape: name of a cross-section registered with register_shape
+    size: size of the cross-section, base of the hexagon
+    step_length: distance between lattice points in the unit of size
+    returns: (x, z) tuple of integer arrays with the lattice coordinates
+    of the points inside the cross-section. The arrays are read only
+    since they are shared between wires.
+    """
+    if shape not in shapes:
+        raise ValueError("Unknown cross-section " + str(shape))
+    extent = int(np.ceil(size / float(step_length))) + 1
+    x, z = np.meshgrid(np.arange(-extent, extent + 1),
+                       np.arange(-extent, extent + 1), indexing="ij")
+    inside = np.asarray(shapes[shape](x * step_length, z * step_length,
+                                      size), dtype=bool)
+    xs, zs = x[inside], z[inside]
+    xs.setflags(write=False)
+    zs.setflags(write=False)
+    return xs, zs
+
+
+def register_shape(name, shape=None):
+    """ Register a cross-section under `name`
+
+    Can be used as a decorator, ``@register_shape("name")``, on a
+    function ``shape(x, z, size)`` taking arrays of coordinates and
+    returning a boolean array that is true inside the cross-section.
+    The cross-section should lie within -size <= x, z <= size.
+    """
+    def register(shape):
+        shapes[name] = shape
+        cross_section_mask.cache_clear()
+        return shape
+    if shape is None:
+        return register
+    return register(shape)
+
+
+def register_polygon(name, vertices):
+    """ Register the polygon with corners `vertices` as cross-section
+
+    vertices: list of (x, z) tuples, scaled by the size of the
+    cross-section, in order around the polygon.
+    """
+    vertices = np.array(vertices, dtype=float)
+
+    def polygon(x, z, size):
+        # even-odd rule: count the edges crossed by a ray in +x direction
+        inside = np.zeros(np.shape(x), dtype=bool)
+        corners = vertices * size
+        for (x1, z1), (x2, z2) in zip(corners, np.roll(corners, -1, 0)):
+            if z1 == z2:
+                continue
+            crosses = (z1 <= z) != (z2 <= z)
+            x_cross = x1 + (z - z1) * (x2 - x1) / (z2 - z1)
+            inside ^= crosses & (x < x_cross)
+        return inside
+
+    return register_shape(name, polygon)
+
+
+@register_shape("hexagon")
+def _hexagon(x, z, base):
+    # vectorized version of hexagon()
+    return ((z < sqrt(3) * base / 2.0) & (z < sqrt(3) * (base - x))
+            & (z >= sqrt(3) * (x - base)) & (z >= - sqrt(3) * base / 2.0)
+            & (z >= - sqrt(3) * (x + base)) & (z < sqrt(3) * (x + base)))
+
+
+@register_shape("circle")
+def _circle(x, z, radius):
+    return x ** 2 + z ** 2 < radius ** 2
+
+
+@register_shape("triangle")
+def _triangle(x, z, base):
+    # equilateral with side 2 * base, centered like the hexagon
+    return ((z >= - sqrt(3) * base / 2.0)
+            & (z < sqrt(3) * base / 2.0 - sqrt(3) * np.abs(x)))
+
+
+@register_shape("core_shell")
+def _core_shell(x, z, base):
+    # hexagonal shell around a core of half the size, for wires where
+    # the band offset confines the electrons to the shell
+    return _hexagon(x, z, base) & ~_hexagon(x, z, base / 2.0)
+
+
 def extension(pos, base, wire_length, lead_length):
     return False
     x, y, z = pos
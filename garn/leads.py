@@ -0,0 +1,129 @@
+"""Leads shared between wires.
+
+Wires in a length sweep have the same leads, only shifted along the
+wire. Two caches avoid doing the lead work once per wire:
+
+* :func:`shared_builder` hands the same lead builder to every wire
+  asking for a lead with the same key.
+* :func:`precalculated_system` reuses the modes and self-energies of
+  leads calculated at the same energy for any earlier wire. Leads are
+  matched by :func:`lead_signature`, which describes the unit cell of
+  the finalized lead up to a translation, so leads are only shared when
+  their Hamiltonians are identical.
+
+The caches live in the process, forked workers get a copy each and
+threads share them.
+"""
+
+import collections
+import copy
+import hashlib
+import threading
+
+import numpy as np
+
+# Largest number of (lead, energy) pairs kept by precalculated_system.
+mode_cache_size = 1000
+
+# Largest number of lead builders kept by shared_builder.
+builder_cache_size = 64
+
+_modes = collections.OrderedDict()
+_builders = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(cache, key, value, size):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > size:
+        cache.popitem(last=False)
+
+
+def shared_builder(key, make, *args):
+    """Lead builder for `key`, made with `make(*args)` the first time."""
+    with _lock:
+        if key in _builders:
+            _builders.move_to_end(key)
+            return _builders[key]
+    builder = make(*args)
+    with _lock:
+        _remember(_builders, key, builder, builder_cache_size)
+    return builder
+
+
+def lead_signature(lead, values):
+    """Key identifying a finalized lead up to translation.
+
+    Parameters
+    ----------
+    lead : kwant InfiniteSystem
+    values : tuple
+        Everything else the lead Hamiltonian depends on, for example
+        the wire class and `t`.
+
+    Returns
+    -------
+    str
+        Digest of `values`, the period of the lead and the tags of the
+        unit cell sites relative to the first one, in the order used by
+        the lead.
+
+    """
+    tags = np.array([tuple(site.tag) for site in lead.sites])
+    digest = hashlib.sha1(repr(values).encode())
+    digest.update(np.asarray(lead.symmetry.periods, dtype=float).tobytes())
+    digest.update((tags - tags[0]).astype(np.int64).tobytes())
+    digest.update(str(len(lead.sites)).encode())
+    return digest.hexdigest()
+
+
+def precalculated_system(system, energy, signatures, params=None):
+    """Copy of `system` with the leads replaced by precalculated ones.
+
+    Leads whose signature was seen before at `energy` are taken from the
+    cache, the rest are calculated with kwant's `precalculate` and
+    added to it.
+
+    Parameters
+    ----------
+    system : kwant FiniteSystem
+    energy : float
+    signatures : list of str
+        :func:`lead_signature` of every lead of `system`.
+    params : dict, optional
+        Kwant parameters for the leads.
+
+    """
+    leads = {}
+    missing = []
+    with _lock:
+        for i, signature in enumerate(signatures):
+            if signature in leads:
+                continue
+            if (signature, energy) in _modes:
+                _modes.move_to_end((signature, energy))
+                leads[signature] = _modes[(signature, energy)]
+            else:
+                leads[signature] = None
+                missing.append(i)
+
+    if missing:
+        calculated = system.precalculate(energy, leads=missing,
+                                         what="all", params=params)
+        with _lock:
+            for i in missing:
+                leads[signatures[i]] = calculated.leads[i]
+                _remember(_modes, (signatures[i], energy),
+                          calculated.leads[i], mode_cache_size)
+
+    result = copy.copy(system)
+    result.leads = [leads[signature] for signature in signatures]
+    return result
+
+
+def clear():
+    """Empty both caches."""
+    with _lock:
+        _modes.clear()
+        _builders.clear()
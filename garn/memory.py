@@ -0,0 +1,56 @@
+"""Memory use of wire construction and transmission calculations."""
+
+import os
+import resource
+import sys
+
+
+def peak_memory():
+    """Peak resident set size of the process so far in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # bytes on macOS, kilobytes elsewhere
+        return peak / 1024.0 ** 2
+    return peak / 1024.0
+
+
+def resident_memory():
+    """Resident set size of the process now in MB.
+
+    Unlike :func:`peak_memory` it also goes down, so the difference
+    before and after a step is the memory kept by that step. Returns
+    None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (IOError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024.0 ** 2
+
+
+def low_memory_solver(nrhs=1, ordering=None):
+    """MUMPS solver set up to use as little memory as possible.
+
+    The right hand sides are kept sparse and solved `nrhs` at a time,
+    which keeps the dense solution blocks small at the cost of speed.
+    The returned object has the same `smatrix` and `greens_function`
+    methods as kwant.
+
+    Parameters
+    ----------
+    nrhs : int, optional
+        Number of right hand sides solved at the same time.
+    ordering : str, optional
+        Fill-in reducing ordering used by MUMPS, for example "metis".
+
+    Raises
+    ------
+    ImportError
+        If kwant was built without MUMPS.
+
+    """
+    from kwant.solvers import mumps
+    solver = mumps.Solver()
+    solver.options(nrhs=nrhs, ordering=ordering, sparse_rhs=True)
+    return solver
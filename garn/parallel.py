@@ -0,0 +1,172 @@
+"""Parallel calculation of transmission with process or thread pools.
+
+With processes the wire is handed to the workers by forking, so the
+finalized kwant system is never pickled, but every worker ends up with
+its own copy of it once it is touched. With threads all workers share
+the one finalized system of the calling process. The sparse solves in
+kwant spend most of their time in MUMPS and BLAS, which run without
+the GIL, so threads scale as long as the solves dominate.
+
+BLAS and OpenMP libraries start as many threads as there are cores by
+default. With several workers each solving on all cores the machine is
+oversubscribed, so the workers limit them with :func:`blas_threads`.
+"""
+
+import concurrent.futures
+import contextlib
+import itertools
+import multiprocessing
+import os
+import time
+
+# Wire used by the worker processes, set just before the pool is forked.
+_wire = None
+
+# Environment variables read by the common BLAS and OpenMP libraries.
+_THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                     "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                     "VECLIB_MAXIMUM_THREADS"]
+
+
+@contextlib.contextmanager
+def blas_threads(number):
+    """Limit BLAS and OpenMP to `number` threads inside the block.
+
+    Uses threadpoolctl if it is installed, which changes the limits of
+    the libraries already loaded. Without it only the environment
+    variables are set, which is honoured by libraries loaded later, for
+    example in processes started afterwards.
+
+    Parameters
+    ----------
+    number : int or None
+        None leaves the limits unchanged.
+
+    """
+    if number is None:
+        yield
+        return
+
+    saved = {name: os.environ.get(name) for name in _THREAD_VARIABLES}
+    for name in _THREAD_VARIABLES:
+        os.environ[name] = str(number)
+    try:
+        try:
+            import threadpoolctl
+        except ImportError:
+            yield
+        else:
+            with threadpoolctl.threadpool_limits(limits=number):
+                yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def default_blas_threads(workers):
+    """BLAS threads per worker sharing the cores between `workers`."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _limit_threads(number):
+    # Pool initializer, the limit holds for the lifetime of the worker.
+    blas_threads(number).__enter__()
+
+
+def timed_block(wire, block):
+    """`block`, its transmissions and the seconds spent solving them."""
+    energy, params_list = block[-2:]
+    start = time.time()
+    transmission = wire._calculate_block(energy, params_list)
+    return block, transmission, time.time() - start
+
+
+def _transmission_block(block):
+    return timed_block(_wire, block)
+
+
+def map_blocks(wire, blocks, workers=1, executor="process",
+               threads_per_worker=None):
+    """Transmission of `wire` for every block in `blocks`.
+
+    Parameters
+    ----------
+    wire : :class:`~garn.Wire2D` or :class:`~garn.Wire3D`
+    blocks : list of tuple
+        The last two items of every block are an energy and a list of
+        kwant parameters, see
+        :meth:`~garn.system_wide.Wire._calculate_block`. The items before
+        are passed through untouched, to tell where the result belongs.
+    workers : int, optional
+        Number of processes or threads. With 1 everything is calculated
+        in the calling thread.
+    executor : str, optional
+        "process" for a pool of forked processes, "thread" for a pool of
+        threads sharing `wire`, "shared" for a pool of spawned processes
+        sharing the system through shared memory, see
+        :func:`~garn.shared.map_shared`.
+    threads_per_worker : int, optional
+        BLAS and OpenMP threads of every worker, defaults to
+        :func:`default_blas_threads`. Not changed with one worker.
+
+    Yields
+    ------
+    (block, list of float, float)
+        Every block together with its transmissions and the seconds
+        spent solving it, in the order the blocks are finished. Closing
+        the generator early stops the workers.
+
+    """
+    global _wire
+    if executor not in ("process", "thread", "shared"):
+        raise ValueError("Unknown executor " + str(executor))
+    if workers == 1:
+        for block in blocks:
+            yield timed_block(wire, block)
+        return
+
+    if threads_per_worker is None:
+        threads_per_worker = default_blas_threads(workers)
+
+    if executor == "shared":
+        from garn.shared import map_shared
+        for result in map_shared(wire, blocks, workers, threads_per_worker):
+            yield result
+        return
+
+    if executor == "thread":
+        # threadpoolctl limits are per process, so the product of
+        # workers and BLAS threads is bounded by the same limit.
+        # Only a few blocks are queued at a time, so a caller closing the
+        # generator early does not wait for all of them.
+        blocks = iter(blocks)
+        with blas_threads(threads_per_worker), \
+                concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            pending = set(pool.submit(timed_block, wire, block)
+                          for block in itertools.islice(blocks, 2 * workers))
+            try:
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        for block in itertools.islice(blocks, 1):
+                            pending.add(pool.submit(timed_block, wire,
+                                                    block))
+                        yield future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+        return
+
+    _wire = wire
+    try:
+        with multiprocessing.get_context("fork").Pool(
+                workers, _limit_threads, (threads_per_worker,)) as pool:
+            for result in pool.imap_unordered(_transmission_block, blocks):
+                yield result
+    finally:
+        _wire = None
@@ -0,0 +1,152 @@
+"""Batch plotting of many transmission curves without a display.
+
+Figures are drawn on matplotlib's Agg canvas directly, without pyplot,
+so nothing waits for a window and the backend of the calling program is
+left alone. Data files are read from disk by the worker processes, long
+curves are decimated before they are drawn, and every figure holds a
+grid of panels.
+
+.. code-block:: Python
+
+    garn.plotting.plot_files("data-sweep-*", "figure-sweep", workers=8)
+
+"""
+
+import glob
+import multiprocessing
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from garn.serialization import read_data_file
+
+# Header fields of the data files of both wire classes. Files without a
+# shape, like those of Wire2D, get the default.
+_PARAMETERS_NAMES = ["identifier", "t", "base", "wire_length",
+                     "lead_length", "start_top", "start_right",
+                     "start_left", "start_bottom", "end_top", "end_right",
+                     "end_left", "end_bottom", "shape"]
+
+
+def decimate(energies, transmission_data, max_points=2000):
+    """Reduce a curve to at most about `max_points` points.
+
+    The curve is split into `max_points` / 2 buckets of consecutive
+    points and the smallest and largest transmission of every bucket
+    are kept, in their original order, so steps and peaks survive.
+
+    Returns
+    -------
+    (energies, transmission_data) : tuple of numpy.ndarray
+
+    """
+    energies = np.asarray(energies, dtype=float)
+    transmission_data = np.asarray(transmission_data, dtype=float)
+    if len(energies) <= max_points:
+        return energies, transmission_data
+
+    buckets = np.array_split(np.arange(len(energies)), max(max_points // 2,
+                                                           1))
+    keep = []
+    for bucket in buckets:
+        values = transmission_data[bucket]
+        keep.extend(sorted({bucket[np.argmin(values)],
+                            bucket[np.argmax(values)]}))
+    return energies[keep], transmission_data[keep]
+
+
+def _read(file_name):
+    values, energies, transmission_data = read_data_file(file_name,
+                                                         _PARAMETERS_NAMES)
+    order = np.argsort(energies)
+    return values[0], energies[order], transmission_data[order]
+
+
+def render_figure(file_names, output, columns=4, max_points=2000,
+                  file_type="png", panel_size=(3, 2.2)):
+    """Draw one panel per data file in `file_names` and save to `output`.
+
+    Parameters
+    ----------
+    file_names : list of str
+        Data files written by :meth:`~garn.system_wide.Wire.transmission`.
+    output : str
+        File name of the figure.
+    columns : int, optional
+        Panels per row.
+    max_points : int, optional
+        Curves are decimated to about this many points, see
+        :func:`decimate`.
+    file_type : str, optional
+        Format of the figure.
+    panel_size : (float, float), optional
+        Width and height of one panel in inches.
+
+    Returns
+    -------
+    str
+        `output`.
+
+    """
+    columns = max(1, min(columns, len(file_names)))
+    rows = max(1, -(-len(file_names) // columns))
+    figure = Figure(figsize=(panel_size[0] * columns, panel_size[1] * rows))
+    FigureCanvasAgg(figure)
+    for i, file_name in enumerate(file_names):
+        identifier, energies, transmission_data = _read(file_name)
+        energies, transmission_data = decimate(energies, transmission_data,
+                                               max_points)
+        axes = figure.add_subplot(rows, columns, i + 1)
+        axes.plot(energies, transmission_data, linewidth=0.8)
+        axes.set_title(identifier, fontsize="small")
+        axes.tick_params(labelsize="x-small")
+    figure.supxlabel("Energy [t]")
+    figure.supylabel("Transmission [$e^2/h$]")
+    figure.tight_layout()
+    figure.savefig(output, format=file_type)
+    return output
+
+
+def _render(task):
+    return render_figure(*task[:2], **task[2])
+
+
+def plot_files(file_names, output_prefix="figure", panels_per_figure=16,
+               columns=4, workers=1, max_points=2000, file_type="png"):
+    """Plot many data files as figures of several panels.
+
+    Parameters
+    ----------
+    file_names : str or list of str
+        Data files, or a glob pattern matching them. They are plotted in
+        sorted order.
+    output_prefix : str, optional
+        Figures are saved as `output_prefix` + "-0." + `file_type`,
+        `output_prefix` + "-1." + `file_type`, ...
+    panels_per_figure : int, optional
+    columns : int, optional
+    workers : int, optional
+        Number of processes drawing figures at the same time.
+    max_points : int, optional
+    file_type : str, optional
+
+    Returns
+    -------
+    list of str
+        File names of the figures.
+
+    """
+    if isinstance(file_names, str):
+        file_names = glob.glob(file_names)
+    file_names = sorted(file_names)
+    options = {"columns": columns, "max_points": max_points,
+               "file_type": file_type}
+    tasks = [(file_names[first:first + panels_per_figure],
+              output_prefix + "-" + str(i) + "." + file_type, options)
+             for i, first in enumerate(range(0, len(file_names),
+                                             panels_per_figure))]
+    if workers == 1:
+        return [_render(task) for task in tasks]
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        return pool.map(_render, tasks)
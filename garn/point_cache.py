@@ -0,0 +1,188 @@
+"""Transmission points shared between users through a directory.
+
+Data files and database entries are named by the free-form identifier
+of a wire, so two people calculating the same wire do not know of each
+other. :class:`PointCache` instead addresses points by content: the
+wire class, every wire parameter except the identifier, the solver, the
+kwant parameters, the leads used and the kwant version are hashed to a
+key, and every key has one append-only file of energy transmission
+lines in the cache directory.
+
+.. code-block:: Python
+
+    cache = garn.point_cache.PointCache("/shared/garn-cache")
+    wire = garn.Wire3D(base=3, wire_length=30, lead_length=5,
+                       identifier="cached", point_cache=cache)
+    wire.transmission(0, 1, 500)  # only points nobody calculated before
+
+Writers lock the file they append to with flock, so many processes and
+users can share the directory. When the directory grows beyond
+`max_bytes` the least recently used files are removed.
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+
+import kwant
+
+from garn.serialization import format_float
+
+# Changed whenever the Hamiltonians change, so old points are not used.
+cache_version = 1
+
+
+class PointCache(object):
+    """Content addressed cache of transmission points in `directory`.
+
+    Parameters
+    ----------
+    directory : str
+        Created if it does not exist.
+    max_bytes : int, optional
+        Size of the cache files above which the least recently used
+        ones are removed.
+    check_every : int, optional
+        Number of points stored by this process between two checks of
+        the size.
+
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 30, check_every=1000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.check_every = check_every
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._points = {}
+        # Inode and bytes read of the file of every key.
+        self._offsets = {}
+        self._stored = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes start with empty memory and a lock of their
+        # own.
+        state = dict(self.__dict__)
+        state.update(_points={}, _offsets={}, _stored=0, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, wire, in_leads, out_leads, params):
+        """Hash of everything the transmission of `wire` depends on
+        except the energy."""
+        content = (cache_version, kwant.__version__,
+                   wire.__class__.__name__,
+                   tuple(wire.parameters_values[1:]), wire.solver,
+                   tuple(in_leads), tuple(out_leads),
+                   tuple(sorted(params.items())))
+        return hashlib.sha256(repr(content).encode()).hexdigest()
+
+    def _file_name(self, key):
+        return os.path.join(self.directory, key + ".points")
+
+    def _read(self, key):
+        """Read the lines appended to the file of `key` since last time.
+
+        Another process may have evicted the file and created it again
+        since, then it is read from the start. Lines that cannot be
+        parsed are skipped.
+        """
+        file_name = self._file_name(key)
+        points = self._points.setdefault(key, {})
+        try:
+            with open(file_name, "rb") as f:
+                status = os.fstat(f.fileno())
+                inode, offset = self._offsets.get(key, (None, 0))
+                if inode != status.st_ino or offset > status.st_size:
+                    offset = 0
+                f.seek(offset)
+                text = f.read()
+        except FileNotFoundError:
+            return points
+        # A line is only complete once its newline is written.
+        complete = text.rfind(b"\n") + 1
+        for line in text[:complete].decode(errors="replace").splitlines():
+            try:
+                energy, transmission = line.split()
+                points[energy] = float(transmission)
+            except ValueError:
+                continue
+        self._offsets[key] = (status.st_ino, offset + complete)
+        return points
+
+    def get(self, key, energy):
+        """Stored transmission at `energy`, None if there is none."""
+        energy = format_float(energy)
+        with self._lock:
+            if energy not in self._points.get(key, {}):
+                self._read(key)
+            transmission = self._points[key].get(energy)
+        if transmission is not None:
+            try:
+                # The modification time tells which files were used last.
+                os.utime(self._file_name(key))
+            except FileNotFoundError:
+                pass
+        return transmission
+
+    def put(self, key, energy, transmission):
+        """Store `transmission` at `energy` for `key`."""
+        line = format_float(energy) + " " + format_float(transmission) + "\n"
+        with open(self._file_name(key), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        with self._lock:
+            self._stored = self._stored + 1
+            check = self._stored % self.check_every == 0
+        if check:
+            self.evict()
+
+    def size(self):
+        """Bytes used by the cache files."""
+        return sum(entry.stat().st_size for entry in
+                   os.scandir(self.directory)
+                   if entry.name.endswith(".points"))
+
+    def evict(self):
+        """Remove least recently used files until the cache is below
+        `max_bytes`."""
+        with open(os.path.join(self.directory, "lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = [(entry.stat().st_mtime, entry.stat().st_size,
+                            entry.path) for entry in
+                           os.scandir(self.directory)
+                           if entry.name.endswith(".points")]
+                size = sum(entry[1] for entry in entries)
+                for mtime, entry_size, path in sorted(entries):
+                    if size <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    size = size - entry_size
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        with self._lock:
+            # Files may be gone, read them from the start next time.
+            self._points.clear()
+            self._offsets.clear()
+
+    def clear(self):
+        """Remove every cache file."""
+        max_bytes = self.max_bytes
+        self.max_bytes = -1
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
@@ -0,0 +1,158 @@
+"""Progress and throughput of long calculations.
+
+:class:`Progress` keeps count of the points of a calculation and
+reports structured progress events, dictionaries with the points done
+and remaining, the throughput, the expected time left and the solve
+time per point. Events are logged to the "garn.progress" logger at most
+every :data:`default_log_interval` seconds, and when the calculation is done, instead
+of one line per point. They can also be appended as JSON lines to a
+metrics file that monitoring tools follow.
+
+.. code-block:: Python
+
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    wire.transmission(0, 1, 10000, metrics_file="metrics.jsonl")
+
+"""
+
+import json
+import logging
+import time
+
+logger = logging.getLogger("garn.progress")
+
+# Default seconds between two logged progress events.
+default_log_interval = 10.0
+
+
+class Progress(object):
+    """Points done, throughput and expected time left of a calculation.
+
+    Parameters
+    ----------
+    total : int
+        Number of points in the calculation.
+    callback : callable, optional
+        Called with the :class:`Progress` instance after every
+        :meth:`update`.
+    name : str, optional
+        Name of the calculation, for example the wire identifier, added
+        to every event.
+    log : bool, optional
+        Log events to the "garn.progress" logger. The wires set it from
+        their `print_to_commandline` option, which is true by default,
+        but the events are only printed once logging is configured, see
+        :mod:`garn.progress`.
+    log_interval : float, optional
+        Least number of seconds between two logged events, defaults to
+        :data:`default_log_interval`.
+    metrics_file : str, optional
+        Every logged event is also appended to this file as one line of
+        JSON.
+
+    Attributes
+    ----------
+    done : int
+        Number of points calculated so far.
+    start_time : float
+        Time of creation as given by time.time().
+    solve_time : float
+        Sum of the solve times passed to :meth:`update`.
+
+    """
+
+    def __init__(self, total, callback=None, name="", log=False,
+                 log_interval=None, metrics_file=None):
+        self.total = total
+        self.done = 0
+        self.callback = callback
+        self.name = name
+        self.log = log
+        self.log_interval = (default_log_interval if log_interval is None
+                             else log_interval)
+        self.metrics_file = metrics_file
+        self.start_time = time.time()
+        self.solve_time = 0.0
+        self.last_solve_time = None
+        self._last_emit = self.start_time
+
+    def update(self, points=1, solve_time=None):
+        """Mark `points` more points as calculated.
+
+        Parameters
+        ----------
+        points : int, optional
+        solve_time : float, optional
+            Seconds spent solving these points, summed over workers.
+
+        """
+        self.done = self.done + points
+        if solve_time is not None and points > 0:
+            self.solve_time = self.solve_time + solve_time
+            self.last_solve_time = solve_time / points
+        if self.callback is not None:
+            self.callback(self)
+        if (self.log or self.metrics_file) and (
+                self.done >= self.total or
+                time.time() - self._last_emit >= self.log_interval):
+            self.emit()
+
+    def event(self):
+        """Progress event as a dictionary.
+
+        Has the keys "name", "done", "total", "remaining", "elapsed",
+        "points_per_second", "eta" and "solve_time", the mean seconds
+        spent solving one point, which is None as long as no solve times
+        were given to :meth:`update`.
+        """
+        return {"name": self.name, "time": time.time(),
+                "done": self.done, "total": self.total,
+                "remaining": self.remaining, "elapsed": self.elapsed,
+                "points_per_second": self.points_per_second,
+                "eta": self.eta,
+                "solve_time": (self.solve_time / self.done
+                               if self.last_solve_time is not None else None)}
+
+    def emit(self):
+        """Log the current event and append it to the metrics file."""
+        self._last_emit = time.time()
+        event = self.event()
+        if self.log:
+            logger.info("%s %s", self.name, self, extra={"progress": event})
+        if self.metrics_file:
+            with open(self.metrics_file, "a") as f:
+                f.write(json.dumps(event) + "\n")
+
+    @property
+    def remaining(self):
+        return self.total - self.done
+
+    @property
+    def elapsed(self):
+        """Seconds since the calculation started."""
+        return time.time() - self.start_time
+
+    @property
+    def points_per_second(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.done / elapsed
+
+    @property
+    def eta(self):
+        """Expected seconds left, None before the first point is done."""
+        if self.done == 0:
+            return None
+        return self.remaining / self.points_per_second
+
+    def __str__(self):
+        eta = self.eta
+        text = "{}/{} points, {:.2f} points/s, ETA {}".format(
+            self.done, self.total, self.points_per_second,
+            "unknown" if eta is None else "{:.0f} s".format(eta))
+        if self.last_solve_time is not None:
+            text = text + ", {:.3f} s/point".format(self.solve_time /
+                                                    self.done)
+        return text
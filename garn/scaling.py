@@ -0,0 +1,236 @@
+"""Runtime and memory of wires as a function of their size.
+
+:func:`scaling_study` builds :class:`~garn.Wire3D` wires of several
+sizes, each in a fresh process, and measures the construction time,
+the time per energy and the peak memory. Power laws in the number of
+sites are fitted to the measurements and saved to a file, which
+:func:`estimate_cost` uses to predict the cost of a sweep before it is
+submitted.
+
+.. code-block:: Python
+
+    garn.scaling.scaling_study(bases=[3, 5, 8], wire_lengths=[30, 60, 120])
+    garn.estimate_cost(dict(base=10, wire_length=300), n_energies=1000,
+                       workers=8)
+
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from garn.energy_grid import EnergyGrid
+from garn.geometry import cross_section_mask
+from garn.memory import peak_memory
+from garn.wire_3d import Wire3D
+
+# File where scaling_study saves the fitted model and estimate_cost
+# looks for it.
+model_file = "garn-scaling.json"
+
+
+def number_of_sites(wire_params):
+    """Number of sites in the scattering region of a Wire3D.
+
+    Parameters
+    ----------
+    wire_params : dict
+        Keyword arguments of :class:`~garn.Wire3D`. Only `base`,
+        `wire_length`, `step_length` and `shape` are used.
+
+    """
+    scaling_factor = wire_params.get("step_length", 1) ** -1
+    base = int(scaling_factor * wire_params.get("base", 3))
+    wire_length = int(scaling_factor * wire_params.get("wire_length", 30))
+    xs, zs = cross_section_mask(wire_params.get("shape", "hexagon"), base)
+    return len(xs) * wire_length
+
+
+def _measure(wire_params, n_energies):
+    baseline = peak_memory()
+    start = time.time()
+    wire = Wire3D(**wire_params)
+    build_time = time.time() - start
+
+    in_leads, out_leads = wire._in_out_nums()
+    energies = EnergyGrid(0.5, 1.5, n_energies)
+    start = time.time()
+    for energy in energies:
+        wire._calculate_transmission(energy, in_leads, out_leads)
+    solve_time = (time.time() - start) / len(energies)
+
+    return {"wire_params": wire_params,
+            "sites": number_of_sites(wire_params),
+            "build_time": build_time,
+            "solve_time": solve_time,
+            "baseline_memory": baseline,
+            "memory": peak_memory() - baseline}
+
+
+def measure(wire_params, n_energies=3):
+    """Measure one wire in a fresh process.
+
+    Returns
+    -------
+    dict
+        `sites`, `build_time` and `solve_time` (per energy) in seconds,
+        `memory` used by the wire and `baseline_memory` of the process
+        before the wire was built, both in MB.
+
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (wire_params, n_energies))
+
+
+def fit_scaling(measurements):
+    """Fit power laws in the number of sites to `measurements`.
+
+    Every quantity q in "build_time", "solve_time" and "memory" is
+    fitted as :math:`q = c N^a` by least squares in log-log scale.
+
+    Returns
+    -------
+    dict
+        For every quantity a dictionary with `coefficient` and
+        `exponent`, and the mean `baseline_memory`.
+
+    """
+    sites = np.log([m["sites"] for m in measurements])
+    model = {"baseline_memory": float(np.mean(
+        [m["baseline_memory"] for m in measurements]))}
+    for quantity in ["build_time", "solve_time", "memory"]:
+        # A tiny floor keeps the logarithm finite for unmeasurably small
+        # values.
+        values = np.log([max(m[quantity], 1e-6) for m in measurements])
+        exponent, log_coefficient = np.polyfit(sites, values, 1)
+        model[quantity] = {"coefficient": float(np.exp(log_coefficient)),
+                           "exponent": float(exponent)}
+    return model
+
+
+def scaling_study(bases, wire_lengths, n_energies=3, file_name=None,
+                  **wire_params):
+    """Measure every combination of `bases` and `wire_lengths` and fit.
+
+    Parameters
+    ----------
+    bases : list of int or float
+    wire_lengths : list of int or float
+    n_energies : int, optional
+        Number of energies solved per wire.
+    file_name : str, optional
+        Where the measurements and the fitted model are saved as JSON.
+        Defaults to :data:`model_file`.
+    wire_params
+        Other keyword arguments of :class:`~garn.Wire3D`.
+
+    Returns
+    -------
+    dict
+        The fitted model, see :func:`fit_scaling`.
+
+    """
+    measurements = []
+    for base in bases:
+        for wire_length in wire_lengths:
+            params = dict(wire_params, base=base, wire_length=wire_length,
+                          identifier="scaling")
+            measurements.append(measure(params, n_energies))
+
+    model = fit_scaling(measurements)
+    with open(file_name or model_file, "w") as f:
+        json.dump({"model": model, "measurements": measurements}, f,
+                  indent=1)
+    return model
+
+
+def load_model(file_name=None):
+    """Model saved by :func:`scaling_study`."""
+    file_name = file_name or model_file
+    if not os.path.exists(file_name):
+        raise IOError("No scaling model in " + file_name +
+                      ", run garn.scaling.scaling_study first")
+    with open(file_name, "r") as f:
+        return json.load(f)["model"]
+
+
+def _power_law(model, quantity, sites):
+    return (model[quantity]["coefficient"] *
+            sites ** model[quantity]["exponent"])
+
+
+def estimate_cost(wire_params, n_energies, workers=1, model=None):
+    """Predict runtime and memory of a transmission sweep.
+
+    Parameters
+    ----------
+    wire_params : dict
+        Keyword arguments of :class:`~garn.Wire3D`.
+    n_energies : int
+        Number of energies in the sweep.
+    workers : int, optional
+        Number of worker processes sharing the energies.
+    model : dict or str, optional
+        Model from :func:`fit_scaling`, or the file it was saved in.
+        Defaults to :data:`model_file`.
+
+    Returns
+    -------
+    dict
+        `seconds` of wall clock time, `memory` per worker and
+        `total_memory` in MB, and a `chunk_size` giving every worker
+        about four chunks of energies.
+
+    """
+    if not isinstance(model, dict):
+        model = load_model(model)
+    sites = number_of_sites(wire_params)
+    build_time = _power_law(model, "build_time", sites)
+    solve_time = _power_law(model, "solve_time", sites)
+    memory = _power_law(model, "memory", sites)
+    energies_per_worker = math.ceil(n_energies / float(workers))
+    return {"seconds": build_time + energies_per_worker * solve_time,
+            "memory": model["baseline_memory"] + memory,
+            "total_memory": workers * (model["baseline_memory"] + memory),
+            "chunk_size": max(1, int(math.ceil(n_energies /
+                                               (4.0 * workers))))}
+
+
+def plan_workers(wire_params, n_energies, memory_limit, max_workers=None,
+                 model=None):
+    """Largest number of workers whose estimated memory fits.
+
+    Parameters
+    ----------
+    memory_limit : float
+        Memory available to the sweep in MB.
+    max_workers : int, optional
+        Defaults to the number of CPUs.
+
+    Returns
+    -------
+    dict
+        The :func:`estimate_cost` of the sweep with the chosen number of
+        workers, with the number added as `workers`.
+
+    Raises
+    ------
+    MemoryError
+        If not even one worker fits in `memory_limit`.
+
+    """
+    if not isinstance(model, dict):
+        model = load_model(model)
+    max_workers = max_workers or os.cpu_count() or 1
+    for workers in range(max_workers, 0, -1):
+        cost = estimate_cost(wire_params, n_energies, workers, model)
+        if cost["total_memory"] <= memory_limit:
+            cost["workers"] = workers
+            return cost
+    raise MemoryError("Estimated memory of one worker exceeds " +
+                      str(memory_limit) + " MB")
@@ -0,0 +1,152 @@
+"""Reading and writing of the "data-" + identifier files.
+
+A data file starts with a header of one "name= value" line per wire
+parameter, in the order of
+:attr:`~garn.system_wide.Wire.parameters_names`, followed by one line
+per calculated point holding the energy and the transmission. Energy
+ranges that were deliberately not calculated are recorded by lines of
+the form "# skipped start end reason", see :func:`format_skipped`.
+
+Floats are written with repr so that reading a file gives back exactly
+the numbers that were written.
+"""
+
+import numpy as np
+
+
+def parse_bool(value):
+    """Parse "True" or "False" as written by :func:`format_header`."""
+    if value == "True":
+        return True
+    if value == "False":
+        return False
+    raise ValueError("Not a boolean: " + value)
+
+
+# Type of every header field, used to parse the header.
+header_types = {"identifier": str, "t": float, "base": int,
+                "wire_length": int, "lead_length": int,
+                "start_top": parse_bool, "start_right": parse_bool,
+                "start_left": parse_bool, "start_bottom": parse_bool,
+                "end_top": parse_bool, "end_right": parse_bool,
+                "end_left": parse_bool, "end_bottom": parse_bool,
+                "shape": str}
+
+# Values of header fields missing in files written before the field was
+# added.
+header_defaults = {"shape": "hexagon"}
+
+
+def format_float(number):
+    """Shortest string that reads back as exactly `number`."""
+    return repr(float(number))
+
+
+def format_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (float, np.floating)):
+        return format_float(value)
+    return str(value)
+
+
+def format_header(parameters_names, parameters_values):
+    """Header of a data file describing the wire that produced it.
+
+    One line of the form "name= value" per parameter, in the order
+    expected by :func:`read_header`.
+    """
+    lines = ""
+    for name, value in zip(parameters_names, parameters_values):
+        lines = lines + name + "= " + format_value(value) + "\n"
+    return lines
+
+
+def format_point(energy, transmission):
+    """Line of a data file holding one energy transmission pair."""
+    return format_float(energy) + " " + format_float(transmission) + "\n"
+
+
+def format_skipped(start_energy, end_energy, reason):
+    """Comment line recording that [`start_energy`, `end_energy`] was
+    skipped for `reason`."""
+    return ("# skipped " + format_float(start_energy) + " " +
+            format_float(end_energy) + " " + reason + "\n")
+
+
+def read_header(f, parameters_names):
+    """Read and parse the header lines of the open data file `f`.
+
+    Returns
+    -------
+    list
+        Value of every parameter in `parameters_names`, converted to the
+        type given by :data:`header_types`.
+
+    Raises
+    ------
+    ValueError
+        If the header does not hold `parameters_names` in order. Fields
+        in :data:`header_defaults` may be missing.
+
+    """
+    values = []
+    for parameter in parameters_names:
+        position = f.tell()
+        name, equal, value = f.readline().partition("=")
+        if name != parameter or not equal:
+            if parameter in header_defaults:
+                f.seek(position)
+                values.append(header_defaults[parameter])
+                continue
+            raise ValueError("Expected header field " + parameter +
+                             " in " + str(getattr(f, "name", f)))
+        values.append(header_types[parameter](value.strip()))
+    return values
+
+
+def read_points(f, skipped=None):
+    """Read the energy transmission pairs following the header of `f`.
+
+    Lines starting with "#" are not points.
+
+    Parameters
+    ----------
+    f : file
+    skipped : list, optional
+        Skipped regions written by :func:`format_skipped` are appended
+        as (start_energy, end_energy, reason) tuples.
+
+    Returns
+    -------
+    (energies, transmission_data) : tuple of numpy.ndarray
+
+    """
+    text = f.read()
+    if "#" in text:
+        lines = text.splitlines()
+        for line in lines:
+            fields = line.split(None, 4)
+            if (skipped is not None and len(fields) >= 4 and
+                    fields[:2] == ["#", "skipped"]):
+                skipped.append((float(fields[2]), float(fields[3]),
+                                fields[4] if len(fields) > 4 else ""))
+        text = "\n".join(line for line in lines
+                         if not line.lstrip().startswith("#"))
+    points = np.fromstring(text, sep=" ").reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+
+def read_data_file(file_name, parameters_names):
+    """Header values and points of the data file `file_name`.
+
+    Returns
+    -------
+    (values, energies, transmission_data)
+        See :func:`read_header` and :func:`read_points`.
+
+    """
+    with open(file_name, "r") as f:
+        values = read_header(f, parameters_names)
+        energies, transmission_data = read_points(f)
+    return values, energies, transmission_data
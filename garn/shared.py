@@ -0,0 +1,305 @@
+"""Finalized systems shared between processes without copying.
+
+A finalized kwant system is a graph of Python objects, and every worker
+process that uses it either unpickles its own copy or, when forked,
+slowly copies the pages it touches. For a fixed set of parameters the
+solvers only need the Hamiltonian of the scattering region as a sparse
+matrix and the unit cell Hamiltonians of the leads, so
+:func:`share_system` evaluates these once and puts the large arrays in
+:mod:`multiprocessing.shared_memory`:
+
+* the CSR data, column indices and row pointers of the Hamiltonian,
+  which also hold the hopping graph,
+* the site positions.
+
+Workers attach to the blocks by name and wrap them in a
+:class:`SharedSystem`, which the kwant solvers accept like the original
+system. The leads are small and sent as :class:`LeadView` objects.
+Start-up time and memory of a worker therefore hardly depend on the
+size of the wire.
+
+.. code-block:: Python
+
+    wire.transmission(0, 1, 1000, workers=16, executor="shared")
+
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import kwant
+import numpy as np
+import scipy.sparse
+
+from garn.parallel import blas_threads, timed_block
+
+
+class SharedArrays(object):
+    """Copies of numpy arrays in shared memory blocks.
+
+    Parameters
+    ----------
+    arrays : dict of numpy.ndarray
+
+    Attributes
+    ----------
+    descriptor : dict
+        Block name, shape and dtype of every array, everything
+        :func:`attach` needs to map the arrays in another process.
+
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.descriptor = {}
+        try:
+            for key, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(
+                    create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype,
+                           buffer=block.buf)[...] = array
+                self.descriptor[key] = (block.name, array.shape,
+                                        array.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """Release and remove the shared memory blocks."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with the
+        # resource tracker again. Spawned workers share the tracker of
+        # the process that created the block, so the block is still
+        # removed once, by SharedArrays.close.
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(descriptor):
+    """Map the arrays described by `descriptor` without copying.
+
+    Returns
+    -------
+    (arrays, blocks)
+        Dictionary of read only arrays and the shared memory blocks
+        behind them, which must be kept alive as long as the arrays are
+        used.
+
+    """
+    arrays = {}
+    blocks = []
+    for key, (name, shape, dtype) in descriptor.items():
+        block = _attach_block(name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    return arrays, blocks
+
+
+class LeadView(object):
+    """Lead with a fixed unit cell Hamiltonian.
+
+    Has the `modes` and `selfenergy` methods the kwant solvers use.
+
+    Parameters
+    ----------
+    lead : kwant InfiniteSystem
+    params : dict
+        Kwant parameters the Hamiltonians are evaluated with.
+
+    """
+
+    def __init__(self, lead, params):
+        self.params = params
+        self.cell = lead.cell_hamiltonian(params=params)
+        self.hopping = lead.inter_cell_hopping(params=params)
+
+    def cell_hamiltonian(self, args=(), sparse=False, *, params=None):
+        if sparse:
+            return scipy.sparse.coo_matrix(self.cell)
+        return self.cell.copy()
+
+    def inter_cell_hopping(self, args=(), sparse=False, *, params=None):
+        if sparse:
+            return scipy.sparse.coo_matrix(self.hopping)
+        return self.hopping.copy()
+
+    def modes(self, energy=0, args=(), *, params=None):
+        hamiltonian = self.cell - energy * np.eye(self.cell.shape[0])
+        return kwant.physics.modes(hamiltonian, self.hopping)
+
+    def selfenergy(self, energy=0, args=(), *, params=None):
+        return self.modes(energy, args, params=params)[1].selfenergy()
+
+
+class SharedSystem(kwant.system.FiniteSystem):
+    """Finalized system evaluated at fixed parameters.
+
+    Parameters
+    ----------
+    arrays : dict of numpy.ndarray
+        "data", "indices" and "indptr" of the Hamiltonian in CSR format
+        and the site positions "positions", as made by
+        :func:`share_system`.
+    leads : list of :class:`LeadView`
+    lead_interfaces : list of numpy.ndarray
+    params : dict
+        Parameters the Hamiltonian was evaluated with. Solving with
+        other parameters raises ValueError.
+
+    """
+
+    def __init__(self, arrays, leads, lead_interfaces, params,
+                 lead_paddings=None):
+        self.arrays = arrays
+        self.params = params
+        self.leads = leads
+        self.lead_interfaces = lead_interfaces
+        self.lead_paddings = lead_paddings or [[] for lead in leads]
+        number_of_sites = len(arrays["indptr"]) - 1
+        # One orbital on every site.
+        self.site_ranges = np.array([[0, 1, 0],
+                                     [number_of_sites, 0, number_of_sites]])
+
+    def _matrix(self, params):
+        if params is not None and params != self.params:
+            raise ValueError("The shared system was evaluated with "
+                             "parameters " + str(self.params) +
+                             ", not " + str(params))
+        n = len(self.arrays["indptr"]) - 1
+        return scipy.sparse.csr_matrix(
+            (self.arrays["data"], self.arrays["indices"],
+             self.arrays["indptr"]), shape=(n, n), copy=False)
+
+    def hamiltonian(self, i, j, *args, params=None):
+        return self._matrix(params)[i, j]
+
+    def hamiltonian_submatrix(self, args=(), to_sites=None, from_sites=None,
+                              sparse=False, return_norb=False, *,
+                              params=None):
+        matrix = self._matrix(params)
+        if to_sites is not None or from_sites is not None:
+            matrix = matrix[slice(None) if to_sites is None else to_sites]
+            matrix = matrix[:, slice(None) if from_sites is None
+                            else from_sites]
+        if not sparse:
+            matrix = matrix.toarray()
+        else:
+            matrix = matrix.tocoo()
+        if return_norb:
+            return (matrix, np.ones(matrix.shape[0], int),
+                    np.ones(matrix.shape[1], int))
+        return matrix
+
+    def pos(self, i):
+        return self.arrays["positions"][i]
+
+
+def share_system(system, params):
+    """Put the large arrays of `system` evaluated at `params` in shared memory.
+
+    Parameters
+    ----------
+    system : kwant FiniteSystem
+    params : dict
+
+    Returns
+    -------
+    (shared, state)
+        The :class:`SharedArrays`, to be closed when the workers are
+        done, and the picklable state :func:`system_view` needs to make
+        a :class:`SharedSystem` in a worker.
+
+    """
+    matrix = system.hamiltonian_submatrix(sparse=True, params=params).tocsr()
+    matrix.sort_indices()
+    positions = np.array([site.pos for site in system.sites])
+    shared = SharedArrays({"data": matrix.data, "indices": matrix.indices,
+                           "indptr": matrix.indptr, "positions": positions})
+    state = {"descriptor": shared.descriptor,
+             "leads": [LeadView(lead, params) for lead in system.leads],
+             "lead_interfaces": [np.asarray(interface) for interface
+                                 in system.lead_interfaces],
+             "lead_paddings": [np.asarray(padding) for padding
+                               in getattr(system, "lead_paddings",
+                                          [[] for lead in system.leads])],
+             "params": params}
+    return shared, state
+
+
+def system_view(state):
+    """:class:`SharedSystem` attached to the arrays of `state`.
+
+    The shared memory blocks are kept alive by the returned system.
+    """
+    arrays, blocks = attach(state["descriptor"])
+    system = SharedSystem(arrays, state["leads"], state["lead_interfaces"],
+                          state["params"], state["lead_paddings"])
+    system.blocks = blocks
+    return system
+
+
+# Wire of the worker process, made by _initialize.
+_wire = None
+
+
+def _wire_state(wire):
+    """Everything but the system a worker needs to calculate like `wire`.
+
+    The values are read through `wire`, so also those set on its class
+    reach the worker.
+    """
+    state = {name: getattr(wire, name)
+             for name in ["identifier", "t", "base", "wire_length",
+                          "lead_length", "leads", "solver", "sparse_solver",
+                          "share_lead_modes", "default_params",
+                          "parameters_values", "point_cache"]}
+    if wire.share_lead_modes:
+        state["_signatures"] = wire._lead_signatures()
+    return state
+
+
+def _initialize(wire_class, wire_state, system_state, threads_per_worker):
+    global _wire
+    blas_threads(threads_per_worker).__enter__()
+    _wire = wire_class.__new__(wire_class)
+    _wire.__dict__.update(wire_state)
+    _wire.sys = system_view(system_state)
+
+
+def _transmission_block(block):
+    return timed_block(_wire, block)
+
+
+def map_shared(wire, blocks, workers, threads_per_worker=None):
+    """Like :func:`~garn.parallel.map_blocks` with spawned processes
+    sharing the system of `wire` through shared memory.
+
+    All blocks must use the parameters of
+    :meth:`~garn.system_wide.Wire._params` without arguments, because the
+    shared Hamiltonian is evaluated once with them.
+    """
+    shared, system_state = share_system(wire.sys, wire._params())
+    context = multiprocessing.get_context("spawn")
+    with shared, context.Pool(workers, _initialize,
+                              (wire.__class__, _wire_state(wire),
+                               system_state, threads_per_worker)) as pool:
+        for result in pool.imap_unordered(_transmission_block, blocks):
+            yield result
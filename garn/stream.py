@@ -0,0 +1,238 @@
+"""Append-only binary files of transmission points read through mmap.
+
+For very dense sweeps the lists wire.energies and wire.transmission_data
+grow without bound. A wire switched to streaming with
+:meth:`~garn.system_wide.Wire.stream_results` instead appends every
+point to a :class:`PointStream` and only keeps memory mapped views of
+the file, so its memory use does not grow with the number of points.
+
+The file starts with the magic bytes :data:`magic`, the length of the
+header as a little endian unsigned 64 bit integer and the header of the
+text data files, see :func:`~garn.serialization.format_header`, padded
+to a multiple of 16 bytes. Then follow the points as pairs of little
+endian float64, energy and transmission. Points are written in chunks
+of `chunk_size`, each sorted by energy, and an incomplete point at the
+end of the file, from a crash during a write, is ignored.
+
+The file as a whole is therefore not sorted, but it is made of a few
+sorted runs, one per chunk or less. :meth:`PointStream.neighbours`
+finds the points around any energy by bisecting every run, which needs
+memory only for the run boundaries.
+
+Energy ranges a wire skipped are appended as lines of
+:func:`~garn.serialization.format_skipped` to the file named like the
+stream with ".skipped" added, which keeps the point file a plain array.
+"""
+
+import os
+
+import numpy as np
+
+from garn.serialization import format_skipped, read_points
+
+magic = b"GARNPTS\x01"
+
+# One point in the file.
+record_dtype = np.dtype([("energy", "<f8"), ("transmission", "<f8")])
+
+
+class PointStream(object):
+    """Points in the append-only file `file_name`.
+
+    Parameters
+    ----------
+    file_name : str
+        Created with `header` if it does not exist.
+    header : str, optional
+        Written at the start of a new file.
+    chunk_size : int, optional
+        Number of points kept in memory before they are written.
+
+    Attributes
+    ----------
+    header : str
+        Header stored in the file.
+
+    Raises
+    ------
+    ValueError
+        If `file_name` exists and is not a point stream.
+
+    """
+
+    def __init__(self, file_name, header="", chunk_size=4096):
+        self.file_name = file_name
+        if os.path.exists(file_name):
+            with open(file_name, "rb") as f:
+                if f.read(len(magic)) != magic:
+                    raise ValueError(file_name + " is not a point stream")
+                length = int(np.frombuffer(f.read(8), "<u8")[0])
+                self.header = f.read(length).decode()
+        else:
+            self.header = header
+            encoded = header.encode()
+            start = len(magic) + 8 + len(encoded)
+            with open(file_name, "wb") as f:
+                f.write(magic)
+                f.write(np.array([len(encoded)], "<u8").tobytes())
+                f.write(encoded)
+                f.write(b"\0" * (-start % record_dtype.itemsize))
+        length = len(self.header.encode())
+        start = len(magic) + 8 + length
+        self.offset = start + (-start % record_dtype.itemsize)
+        self._buffer = np.empty(chunk_size, record_dtype)
+        self._buffered = 0
+        self._map = np.zeros(0, record_dtype)
+        # Start of every sorted run among the first _scanned points.
+        self._starts = [0]
+        self._scanned = 0
+
+    def append(self, energy, transmission):
+        """Add one point, written when the chunk is full."""
+        self._buffer[self._buffered] = (energy, transmission)
+        self._buffered = self._buffered + 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """Write the points kept in memory to the file, sorted."""
+        if self._buffered:
+            chunk = np.sort(self._buffer[:self._buffered], order="energy")
+            with open(self.file_name, "ab") as f:
+                f.write(chunk.tobytes())
+            self._buffered = 0
+
+    def _written(self):
+        size = os.path.getsize(self.file_name) - self.offset
+        return max(size, 0) // record_dtype.itemsize
+
+    def __len__(self):
+        return self._written() + self._buffered
+
+    def points(self):
+        """Memory mapped array of all points with fields "energy" and
+        "transmission", sorted only within every run, see :meth:`runs`."""
+        self.flush()
+        written = self._written()
+        if written != len(self._map):
+            self._map = np.memmap(self.file_name, record_dtype, "r",
+                                  offset=self.offset, shape=(written,))
+        return self._map
+
+    @property
+    def energies(self):
+        """Read only view of the energies in file order."""
+        return self.points()["energy"]
+
+    @property
+    def transmission_data(self):
+        """Read only view of the transmissions in file order."""
+        return self.points()["transmission"]
+
+    def skip(self, start_energy, end_energy, reason):
+        """Record that [`start_energy`, `end_energy`] was skipped for
+        `reason`."""
+        with open(self.file_name + ".skipped", "a") as f:
+            f.write(format_skipped(start_energy, end_energy, reason))
+
+    def skipped(self):
+        """Skipped ranges as (start_energy, end_energy, reason) tuples."""
+        skipped = []
+        try:
+            with open(self.file_name + ".skipped", "r") as f:
+                read_points(f, skipped)
+        except FileNotFoundError:
+            pass
+        return skipped
+
+    def runs(self, chunk_size=2 ** 20):
+        """(start, stop) of the sorted runs of points in the file.
+
+        Only points written since the last call are scanned, `chunk_size`
+        at a time.
+        """
+        energies = self.energies
+        for start in range(max(self._scanned - 1, 0), len(energies) - 1,
+                           chunk_size):
+            block = np.asarray(energies[start:start + chunk_size + 1])
+            self._starts.extend((np.nonzero(np.diff(block) < 0)[0] +
+                                 start + 1).tolist())
+        self._scanned = len(energies)
+        if not len(energies):
+            return []
+        bounds = self._starts + [len(energies)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def neighbours(self, energies):
+        """Stored points around every energy in `energies`.
+
+        Returns
+        -------
+        (lower_energies, lower_transmission, upper_energies, upper_transmission)
+            numpy.ndarray of the point with the largest energy not above
+            and of the point with the smallest energy above every energy
+            in `energies`, NaN where there is none.
+
+        """
+        energies = np.asarray(energies, dtype=float)
+        lower = np.full(energies.shape, np.nan)
+        lower_transmission = np.full(energies.shape, np.nan)
+        upper = np.full(energies.shape, np.nan)
+        upper_transmission = np.full(energies.shape, np.nan)
+        stored = self.energies
+        transmission = self.transmission_data
+        for start, stop in self.runs():
+            run = stored[start:stop]
+            i = np.searchsorted(run, energies, side="right")
+            has = i > 0
+            found = run[i[has] - 1]
+            better = has.copy()
+            better[has] = ~(found <= lower[has])
+            lower[better] = stored[start + i[better] - 1]
+            lower_transmission[better] = transmission[start + i[better] - 1]
+            has = i < len(run)
+            found = run[i[has]]
+            better = has.copy()
+            better[has] = ~(found >= upper[has])
+            upper[better] = stored[start + i[better]]
+            upper_transmission[better] = transmission[start + i[better]]
+        return lower, lower_transmission, upper, upper_transmission
+
+    def sorted(self):
+        """Energies and transmissions sorted by energy.
+
+        Unlike the other methods this needs memory for all points, it is
+        meant for plots.
+
+        Returns
+        -------
+        (energies, transmission_data) : tuple of numpy.ndarray
+
+        """
+        points = self.points()
+        order = np.argsort(points["energy"], kind="stable")
+        return (np.asarray(points["energy"])[order],
+                np.asarray(points["transmission"])[order])
+
+    def missing(self, energies, tolerance, chunk_size=2 ** 20):
+        """The sorted `energies` not within `tolerance` of a stored point.
+
+        Also drops energies within `tolerance` of an earlier energy in
+        `energies`. The run boundaries are scanned `chunk_size` points at
+        a time.
+        """
+        energies = np.sort(np.asarray(list(energies), dtype=float))
+        if len(energies) > 1:
+            keep = np.ones(len(energies), bool)
+            last = energies[0]
+            for i in range(1, len(energies)):
+                if abs(energies[i] - last) > tolerance:
+                    last = energies[i]
+                else:
+                    keep[i] = False
+            energies = energies[keep]
+
+        self.runs(chunk_size)
+        lower, _, upper, _ = self.neighbours(energies)
+        distance = np.fmin(energies - lower, upper - energies)
+        return energies[~(distance <= tolerance)].tolist()
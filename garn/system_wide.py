@@ -1,6 +1,21 @@
+import bisect
+import itertools
+import time
+
 import kwant
 import garn
-from numpy import sqrt
+import numpy as np
+from matplotlib import pyplot
+
+from garn.database import ResultsDatabase
+from garn.energy_grid import EnergyGrid
+from garn.leads import lead_signature, precalculated_system
+from garn.parallel import map_blocks
+from garn.progress import Progress, logger as progress_logger
+from garn.serialization import (format_header, format_point,
+                                format_skipped, read_header, read_points)
+from garn.stream import PointStream
+from garn.wavefunction import WavefunctionCache, reduce_wavefunction
 
 import math
 def truncate(number, digits) -> float:
@@ -11,7 +26,7 @@ def truncate_list(lista, digits):
     for ie in range(len(lista)):
         lista[ie] = truncate(lista[ie], digits)
     return lista
-    
+
 class Wire(object):
     
     a = 1
@@ -21,11 +36,49 @@ class Wire(object):
                         "start_left", "start_bottom", "end_top",
                         "end_right", "end_left", "end_bottom"]
 
+    # Values of the kwant parameters of the scattering region used when
+    # nothing else is asked for: magnetic field `B` and gate potential
+    # `gate`.
+    default_params = {"B": 0, "gate": 0}
+
+    # Kwant solver used for the transmission, "smatrix" or
+    # "greens_function". See :meth:`_calculate_transmission`.
+    solver = "smatrix"
+
+    # Object whose `smatrix` and `greens_function` methods are used
+    # instead of those of kwant, for example
+    # :func:`~garn.memory.low_memory_solver`.
+    sparse_solver = None
+
+    # If True the lead modes and self-energies are taken from the cache in
+    # :mod:`garn.leads`, shared with every wire having the same leads.
+    share_lead_modes = False
+
+    # Transmissions below `zero_tolerance` count as zero when
+    # transmission looks for the onset of the first subband, and points
+    # closer than `plateau_tolerance` to an integer for `plateau_points`
+    # energies in a row make a plateau.
+    zero_tolerance = 1e-6
+    plateau_tolerance = 1e-3
+    plateau_points = 3
+
+    # Coordinate of the site positions along the wire, used to average
+    # over cross-sections.
+    wire_axis = 1
+
+    # Largest number of wave functions kept by :meth:`wavefunction`.
+    wavefunction_cache_size = 32
+
+    # :class:`~garn.stream.PointStream` holding the points once
+    # :meth:`stream_results` is called.
+    stream = None
+
     def __init__(self, base=3, wire_length=30, lead_length=5,
                      identifier="unnamed", file_name="", step_length=1,
                      start_top=True, start_right=True, start_left=True,
                      start_bottom=False, end_top=True, end_right=True,
-                     end_left=True, end_bottom=False ):
+                     end_left=True, end_bottom=False, database="",
+                     point_cache=None):
                  
         """A class inherrited by :class:`~garn.Wire2D` and
         :class:`~garn.Wire3D.
@@ -69,12 +122,26 @@ class Wire(object):
         end_bottom : bool, optional
             Boolian vaules of there should be a lead on the bottom at
             the end of the wire.
+        database : str, optional
+            SQLite file, see :class:`~garn.database.ResultsDatabase`,
+            from which the wire with `identifier` is loaded.
+        point_cache : :class:`~garn.point_cache.PointCache`, optional
+            Consulted before every transmission is calculated, and given
+            every calculated one. Kept in the attribute `point_cache`.
         """
+        self.point_cache = point_cache
         self.energies = []
         self.transmission_data = []
+        self.skipped = []
         self.sys = kwant.Builder()
                  
-        if (file_name == ""):
+        if (database != ""):
+            results = ResultsDatabase(database)
+            results.load(self, identifier)
+            results.close()
+            self.no_file = True
+
+        elif (file_name == ""):
             scaling_factor = step_length ** -1
             self.t = step_length ** -2
             self.no_file = True
@@ -91,12 +158,16 @@ class Wire(object):
             self.no_file = False
 
 
-        self.parameters_values = (self.identifier, self.t, self.base,
+        # Parameters added by subclasses after the leads are attributes
+        # with the same name.
+        self.parameters_values = ((self.identifier, self.t, self.base,
                              self.wire_length, self.lead_length,
                              self.leads[0], self.leads[1],
                              self.leads[2], self.leads[3],
                              self.leads[4], self.leads[5],
-                             self.leads[6], self.leads[7])
+                             self.leads[6], self.leads[7]) +
+                             tuple(getattr(self, name) for name in
+                                   self.parameters_names[13:]))
 
     
     def plot(self):
@@ -169,8 +240,12 @@ class Wire(object):
 
 
         
-    def transmission(self, start_energy, end_energy, number_of_points=500,
-                     print_to_commandline=True):
+    def transmission(self, start_energy=None, end_energy=None,
+                     number_of_points=500, print_to_commandline=True,
+                     tolerance=1e-9, energies=None, workers=1,
+                     executor="thread", threads_per_worker=None,
+                     skip_below_onset=False, stop_after_plateaus=None,
+                     progress=None, metrics_file=None):
         """Calculate transmission through system.
 
         Calculates the transmission in `number_of_points` equidistant points
@@ -186,8 +261,46 @@ class Wire(object):
         end_energy : float, optional
         number_of_points : int, optional
         print_to_commandline : bool
-            If true the resulting transmission energy pairs are printed
-            in the terminal. (Default Ture beacuse good for monitoring progress)
+            If true progress events are logged to the "garn.progress"
+            logger, every few seconds and at the end, see
+            :mod:`garn.progress`. Despite the name nothing is printed
+            unless logging is configured, for example with
+            logging.basicConfig(level=logging.INFO).
+        tolerance : float, optional
+            Energies closer than `tolerance` to an already calculated
+            energy are not calculated again.
+        energies : :class:`~garn.energy_grid.EnergyGrid` or list of float, optional
+            Energies to calculate, used instead of the intervall if given.
+        workers : int, optional
+            Number of energies calculated at the same time.
+        executor : str, optional
+            "thread" to share the finalized system between threads,
+            "process" for forked processes with a copy each, or "shared"
+            for processes sharing the Hamiltonian in shared memory, see
+            :func:`~garn.parallel.map_blocks`.
+        threads_per_worker : int, optional
+            BLAS and OpenMP threads of every worker, defaults to the
+            number of cores divided by `workers`.
+        skip_below_onset : bool, optional
+            Find the first energy with nonzero transmission by bisection
+            and skip the energies below it, which are all zero below the
+            first subband. The transmission must stay zero up to the
+            onset and nonzero above it.
+        stop_after_plateaus : int, optional
+            Calculate the energies in increasing order and stop when the
+            transmission has reached this many integer plateaus, see
+            :attr:`plateau_points`.
+        progress : callable, optional
+            Called with a :class:`~garn.progress.Progress` instance every
+            time a point is done.
+        metrics_file : str, optional
+            Progress events are appended to this file as JSON lines.
+
+        Returns
+        -------
+        (energies, transmission_data)
+            wire.energies and wire.transmission_data with all points of
+            the wire, also those calculated before.
 
         Notes
         -----
@@ -205,47 +318,658 @@ class Wire(object):
 
         The function changes the attributes energy and transmission of
         *wire* and saves to the file "data-" + `wire.identifier`. If the
-        transmission function have been called before or the wire.energies
-        attribute is non-empty the
-        :meth:`~garn.system_wide._energy_exist_dialog` is called asking
-        what to do.
+        transmission function have been called before, or the wire was
+        read from file, only the energies not already in wire.energies
+        are calculated. The new points are merged with the old ones so
+        that wire.energies stays sorted.
+
+        Energy ranges left out by `skip_below_onset` or
+        `stop_after_plateaus` are added to wire.skipped as (start_energy,
+        end_energy, reason) and saved as comment lines in the file. The
+        few points calculated inside them, like the bisection steps, are
+        kept as ordinary points.
 
         
         """
 
-        # handel case when the wire has calculated before
-        if self.energies != []:
-            if (not _energy_exist_dialog()):
-                return
+        if energies is None:
+            energies = EnergyGrid(start_energy, end_energy, number_of_points)
+        energies = self._missing_energies(energies, tolerance)
+        calculated = {}
+        meter = Progress(len(energies), progress, self.identifier,
+                         print_to_commandline, metrics_file=metrics_file)
 
-        intervall_length = end_energy - start_energy
-        stepsize = intervall_length / float(number_of_points)
-        start_step = int(start_energy / float(stepsize))
-        end_step = int(end_energy / float(stepsize))
+        def results(indices):
+            # Yields the index of every point as soon as it is done.
+            blocks = [(i, energies[i], [None]) for i in indices]
+            for (i, en, _), (con_tot,), seconds in map_blocks(
+                    self, blocks, workers, executor, threads_per_worker):
+                calculated[i] = con_tot
+                self._save_to_file(en, con_tot)
+                meter.update(1, seconds)
+                yield i
 
-        self.energies = [stepsize * i for i in range(start_step, end_step)]
-        self.transmission_data = []
-            
+        def calculate(indices):
+            for i in results(indices):
+                pass
+
+        first = 0
+        if skip_below_onset and energies:
+            first = self._find_onset(energies, calculated, calculate)
+            if first > 0:
+                self._skip(energies[0], energies[first - 1], "below onset")
+
+        remaining = [i for i in range(first, len(energies))
+                     if i not in calculated]
+        if stop_after_plateaus is None:
+            calculate(remaining)
+        else:
+            # The points from `first` on are counted in order as they
+            # arrive from one pool, which is closed when there are enough
+            # plateaus. Points still being calculated then are kept.
+            state = (0, 0, None)
+            counted = first
+            points = results(remaining)
+            for _ in itertools.chain([None], points):
+                while counted in calculated and \
+                        state[0] < stop_after_plateaus:
+                    state = self._count_plateaus(state, calculated[counted])
+                    counted = counted + 1
+                if state[0] >= stop_after_plateaus:
+                    break
+            points.close()
+            if state[0] >= stop_after_plateaus and counted < len(energies):
+                self._skip(energies[counted], energies[-1],
+                           "after " + str(state[0]) + " plateaus")
+
+        if meter.done < meter.total:
+            # Points were skipped, the last event is not logged yet.
+            meter.emit()
+
+        indices = sorted(calculated)
+        self._merge_points([energies[i] for i in indices],
+                           [calculated[i] for i in indices])
+        return self.energies, self.transmission_data
+
+    def _find_onset(self, energies, calculated, calculate):
+        """Index of the first of the sorted `energies` with nonzero
+        transmission, found by bisection.
+
+        The transmissions calculated on the way are added to `calculated`
+        by `calculate`. Returns len(`energies`) if all are zero.
+        """
+        def zero(i):
+            if i not in calculated:
+                calculate([i])
+            return calculated[i] <= self.zero_tolerance
+
+        low, high = -1, len(energies) - 1
+        if zero(high):
+            return len(energies)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if zero(middle):
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def _count_plateaus(self, state, con):
+        """Plateaus after one more consecutive transmission `con`.
+
+        `state` is (number of plateaus, length of the current run,
+        integer level of the run) before `con`, (0, 0, None) at the
+        start. Returns the same for the points including `con`.
+        """
+        count, length, level = state
+        nearest = round(con)
+        if nearest >= 1 and abs(con - nearest) < self.plateau_tolerance:
+            length = length + 1 if nearest == level else 1
+            level = nearest
+            if length == self.plateau_points:
+                count = count + 1
+            return count, length, level
+        return count, 0, None
+
+    def _skip(self, start_energy, end_energy, reason):
+        """Record that [`start_energy`, `end_energy`] was not calculated."""
+        self.skipped.append((start_energy, end_energy, reason))
+        if self.stream is not None:
+            self.stream.skip(start_energy, end_energy, reason)
+        else:
+            self._write_to_file(format_skipped(start_energy, end_energy,
+                                               reason))
+
+    def progressive_transmission(self, start_energy, end_energy,
+                                 time_budget, number_of_points=16,
+                                 print_to_commandline=True, tolerance=1e-9):
+        """Calculate transmission with finer and finer grids until time is up.
+
+        The first pass calculates `number_of_points` equidistant points on
+        the intervall [`start_energy`, `end_energy`) like
+        :meth:`transmission`. Every following pass calculates the midpoints
+        of the previous grid, halving the distance between points. A pass
+        is only started if it is expected to finish within `time_budget`,
+        judged from the time per point of the earlier passes.
+
+        Parameters
+        ----------
+        start_energy : float
+        end_energy : float
+        time_budget : float
+            Wall clock time in seconds.
+        number_of_points : int, optional
+            Number of points in the first pass.
+        print_to_commandline : bool, optional
+            If true every completed pass is logged to the "garn.progress"
+            logger, which prints nothing unless logging is configured.
+        tolerance : float, optional
+            See :meth:`transmission`.
+
+        Returns
+        -------
+        int
+            Number of completed passes.
+
+        Notes
+        -----
+        The points of a pass are saved to the file "data-" +
+        `wire.identifier` and added to wire.energies when the pass is
+        completed, so wire.energies always holds a uniform grid. If a pass
+        runs out of time anyway its points are thrown away. The first pass
+        is always completed.
+
+        """
+        deadline = time.time() + time_budget
+        grid = EnergyGrid(start_energy, end_energy, number_of_points)
         in_leads, out_leads = self._in_out_nums()
+        time_per_point = 0.0
+        passes = 0
 
-        if print_to_commandline:
-            print("Transmission_Data calculated for energies [t]: ")
-            
-        for en in self.energies:
-            smatrix = kwant.smatrix(self.sys, en, in_leads=in_leads,
-                                        out_leads=out_leads) 
-            con_tot = 0
-            for i in range(0,len(in_leads)):
-                for j in range(len(in_leads), len(in_leads) +
-                               len(out_leads)):
-                    con = smatrix.transmission(j, i)
-                    con_tot = con_tot + con
-                    #print(str(i) + "-" + str(j) + "= " + str(con)) 
-            self.transmission_data.append(con_tot)
-            self._save_to_file(en, con_tot)
+        while True:
+            if abs(end_energy - start_energy) / len(grid) <= tolerance:
+                return passes
+            energies = self._missing_energies(grid, tolerance)
+            if passes > 0 and (time.time() + time_per_point * len(energies)
+                               > deadline):
+                return passes
+
+            pass_start = time.time()
+            transmission_data = []
+            for en in energies:
+                if passes > 0 and time.time() > deadline:
+                    return passes
+                transmission_data.append(
+                    self._calculate_transmission(en, in_leads, out_leads))
+            if energies:
+                time_per_point = ((time.time() - pass_start) /
+                                  float(len(energies)))
+
+            for en, con_tot in zip(energies, transmission_data):
+                self._save_to_file(en, con_tot)
+            self._merge_points(energies, transmission_data)
+            passes = passes + 1
 
             if print_to_commandline:
-                print(str(en) + " " + str(con_tot))
+                progress_logger.info("%s pass %d completed with %d points",
+                                     self.identifier, passes, len(grid))
+            grid = grid.refined()
+
+    def transmission_at(self, energies, max_error=0.01):
+        """Transmission at arbitrary energies from the calculated points.
+
+        The transmission is interpolated linearly between the calculated
+        points in wire.energies. Transmission through a nanowire is close
+        to a staircase, so the error estimate of a point is taken as the
+        distance between the linear and the nearest neighbour
+        interpolation. It is zero where the two surrounding points have the
+        same transmission and largest halfway between points where a step
+        lies. Energies outside the calculated intervall have infinite
+        error.
+
+        Energies where the estimated error is larger than `max_error` are
+        calculated, added to wire.energies and saved to file, so repeated
+        queries turn into array lookups.
+
+        Parameters
+        ----------
+        energies : float or array_like of float
+        max_error : float, optional
+            Largest accepted error estimate in units of
+            :math:`\dfrac{e^2}{\hbar}`.
+
+        Returns
+        -------
+        (transmission, error) : tuple of float or of numpy.ndarray
+            Same shape as `energies`.
+
+        """
+        energies = np.asarray(energies, dtype=float)
+        transmission, error = self._interpolate_transmission(energies)
+
+        missing = self._missing_energies(energies[error > max_error].ravel(),
+                                         tolerance=0)
+        if missing:
+            in_leads, out_leads = self._in_out_nums()
+            transmission_data = []
+            for en in missing:
+                con_tot = self._calculate_transmission(en, in_leads,
+                                                       out_leads)
+                transmission_data.append(con_tot)
+                self._save_to_file(en, con_tot)
+            self._merge_points(missing, transmission_data)
+            transmission, error = self._interpolate_transmission(energies)
+
+        if energies.ndim == 0:
+            return float(transmission), float(error)
+        return transmission, error
+
+    def _interpolate_transmission(self, energies):
+        """Interpolated transmission and error estimate at `energies`.
+
+        See :meth:`transmission_at`.
+        """
+        flat = np.atleast_1d(energies).ravel()
+        lower, lower_transmission, upper, upper_transmission = \
+            self._neighbours(flat)
+        # Outside the calculated points the nearest one is used.
+        transmission = np.where(np.isnan(lower), upper_transmission,
+                                lower_transmission)
+        transmission[np.isnan(transmission)] = 0.0
+        error = np.full(flat.shape, np.inf)
+
+        inside = ~np.isnan(lower) & ~np.isnan(upper)
+        fraction = (flat[inside] - lower[inside]) / (upper[inside] -
+                                                     lower[inside])
+        step = upper_transmission[inside] - lower_transmission[inside]
+        transmission[inside] = lower_transmission[inside] + fraction * step
+        error[inside] = np.abs(step) * np.minimum(fraction, 1 - fraction)
+
+        error[lower == flat] = 0.0
+
+        return (transmission.reshape(np.shape(energies)),
+                error.reshape(np.shape(energies)))
+
+    def _neighbours(self, energies):
+        """Calculated points around `energies`, see
+        :meth:`~garn.stream.PointStream.neighbours`."""
+        if self.stream is not None:
+            return self.stream.neighbours(energies)
+        known_energies = np.asarray(self.energies, dtype=float)
+        known_transmission = np.asarray(self.transmission_data, dtype=float)
+        # Points to the left get index -1 and to the right len, both
+        # become NaN through the padding.
+        padded_energies = np.concatenate([[np.nan], known_energies, [np.nan]])
+        padded_transmission = np.concatenate([[np.nan], known_transmission,
+                                              [np.nan]])
+        i = np.searchsorted(known_energies, energies, side="right")
+        return (padded_energies[i], padded_transmission[i],
+                padded_energies[i + 1], padded_transmission[i + 1])
+
+    def _missing_energies(self, energies, tolerance):
+        """The `energies` not within `tolerance` of `self.energies`.
+
+        Also drops energies within `tolerance` of an earlier energy in
+        `energies`. Assumes `self.energies` is sorted.
+        """
+        if self.stream is not None:
+            return self.stream.missing(energies, tolerance)
+        missing = []
+        for en in sorted(energies):
+            i = bisect.bisect_left(self.energies, en)
+            neighbours = self.energies[max(i - 1, 0):i + 1]
+            if missing:
+                neighbours = neighbours + missing[-1:]
+            if all(abs(en - old) > tolerance for old in neighbours):
+                missing.append(en)
+        return missing
+
+    def _merge_points(self, energies, transmission_data):
+        """Add calculated points to the sorted energy and transmission lists.
+
+        When streaming the points are already in the stream, and the
+        lists are replaced by fresh memory mapped views of it.
+        """
+        if self.stream is not None:
+            self.energies = self.stream.energies
+            self.transmission_data = self.stream.transmission_data
+            return
+        points = sorted(zip(list(self.energies) + list(energies),
+                            list(self.transmission_data) +
+                            list(transmission_data)))
+        self.energies = [en for en, con in points]
+        self.transmission_data = [con for en, con in points]
+
+    def parameter_sweep(self, energies, name, values, params=None,
+                        workers=1, block_size=64, progress=None,
+                        executor="process", metrics_file=None):
+        """Transmission on a grid of energies and values of one parameter.
+
+        All points are calculated with the same finalized system, only
+        the kwant parameter `name` is changed. The grid is split into
+        blocks of one energy and at most `block_size` parameter values.
+        The leads do not depend on the parameters, so their modes are
+        calculated once per block and reused for every point in it.
+
+        Parameters
+        ----------
+        energies : list of float
+        name : str
+            "B" for the magnetic field or "gate" for the gate potential of
+            the scattering region, see :attr:`default_params`.
+        values : list of float
+            Values of the parameter `name`.
+        params : dict, optional
+            Values of the other parameters.
+        workers : int, optional
+            Number of processes sharing the blocks.
+        block_size : int, optional
+            Largest number of points in a block.
+        progress : callable, optional
+            Called with a :class:`~garn.progress.Progress` instance, which
+            has the throughput in points per second and expected time
+            left, every time a block is done.
+        executor : str, optional
+            "process" or "thread", see :func:`~garn.parallel.map_blocks`.
+            "shared" is not supported, its workers only have the
+            Hamiltonian at the default parameters.
+        metrics_file : str, optional
+            Progress events are appended to this file as JSON lines, see
+            :mod:`garn.progress`.
+
+        Returns
+        -------
+        numpy.ndarray
+            Transmission with shape (len(`energies`), len(`values`)).
+
+        Raises
+        ------
+        ValueError
+            If `name` is not a parameter or `executor` is "shared".
+
+        Notes
+        -----
+        The result is saved in one go when all points are done, with
+        numpy.savez to the file "sweep-" + `wire.identifier` + "-" +
+        `name` + ".npz" holding the arrays `energies`, `values` and
+        `transmission`.
+
+        """
+        if name not in self.default_params:
+            raise ValueError("Unknown parameter " + name)
+        if executor == "shared":
+            raise ValueError("parameter_sweep changes the parameters, which "
+                             "the shared executor cannot")
+
+        blocks = []
+        for i, en in enumerate(energies):
+            for first in range(0, len(values), block_size):
+                block_params = []
+                for value in values[first:first + block_size]:
+                    point_params = dict(params or {})
+                    point_params[name] = value
+                    block_params.append(point_params)
+                blocks.append((i, first, en, block_params))
+
+        transmission = np.zeros((len(energies), len(values)))
+        meter = Progress(len(energies) * len(values), progress,
+                         self.identifier, metrics_file=metrics_file)
+        for (i, first, en, block_params), block_transmission, seconds in \
+                map_blocks(self, blocks, workers, executor):
+            transmission[i, first:first + len(block_params)] = \
+                block_transmission
+            meter.update(len(block_params), seconds)
+
+        np.savez("sweep-" + self.identifier + "-" + name,
+                 energies=energies, values=values,
+                 transmission=transmission)
+        return transmission
+
+    def _calculate_block(self, energy, params_list):
+        """Transmission at `energy` for every parameters in `params_list`.
+
+        The lead modes are calculated once for the whole block.
+        """
+        in_leads, out_leads = self._in_out_nums()
+        if self.point_cache is not None:
+            cached = [self.point_cache.get(
+                self.point_cache.key(self, in_leads, out_leads,
+                                     self._params(params)), energy)
+                for params in params_list]
+            if None not in cached:
+                return cached
+        if self.share_lead_modes:
+            system = precalculated_system(self.sys, energy,
+                                          self._lead_signatures(),
+                                          self._params())
+        else:
+            # greens_function needs the self-energies of the leads too.
+            what = "all" if self.solver == "greens_function" else "modes"
+            system = self.sys.precalculate(energy, params=self._params(),
+                                           what=what)
+        return [self._calculate_transmission(energy, in_leads, out_leads,
+                                             params, system=system)
+                for params in params_list]
+
+    def _lead_signatures(self):
+        """:func:`~garn.leads.lead_signature` of every lead of the system."""
+        if getattr(self, "_signatures", None) is None:
+            self._signatures = [
+                lead_signature(lead, (self.__class__.__name__, self.t))
+                for lead in self.sys.leads]
+        return self._signatures
+
+    def _params(self, params=None):
+        """`params` completed with :attr:`default_params`."""
+        all_params = dict(self.default_params)
+        if params:
+            all_params.update(params)
+        return all_params
+
+    def _calculate_transmission(self, energy, in_leads=None,
+                                out_leads=None, params=None, system=None):
+        """Total transmission from start leads to end leads at `energy`.
+
+        Parameters
+        ----------
+        energy : float
+        in_leads, out_leads : tuple of int, optional
+            Lead numbers as returned by :meth:`_in_out_nums`. Calculated
+            from `self.leads` if not given.
+        params : dict, optional
+            Kwant parameters, missing ones are taken from
+            :attr:`default_params`.
+        system : kwant system, optional
+            Used instead of `self.sys`, for example a copy with
+            precalculated leads.
+
+        Returns
+        -------
+        float
+            Sum of the transmissions from every start lead to every end
+            lead.
+
+        Notes
+        -----
+        With :attr:`solver` set to "smatrix" the scattering matrix is
+        calculated with `kwant.smatrix
+        <http://kwant-project.org/doc/1/reference/generated/kwant.solvers.default.smatrix#kwant.solvers.default.smatrix>`_.
+        With "greens_function" the retarded Green's function between the
+        start and end leads is calculated with `kwant.greens_function
+        <http://kwant-project.org/doc/1/reference/generated/kwant.solvers.default.greens_function#kwant.solvers.default.greens_function>`_
+        and the transmission follows from the Fisher-Lee relation, which
+        skips projecting the solution on the outgoing lead modes. Both
+        only solve for the blocks from the start leads to the end leads.
+
+        If :attr:`sparse_solver` is set its methods are used instead of
+        kwant's default solver.
+
+        If :attr:`share_lead_modes` is True the leads are replaced by
+        precalculated ones from :func:`~garn.leads.precalculated_system`,
+        so wires with equal leads calculate them only once per energy.
+
+        If :attr:`point_cache` is set, points already in it are not
+        calculated again and new points are added to it.
+
+        """
+        if in_leads is None or out_leads is None:
+            in_leads, out_leads = self._in_out_nums()
+
+        if self.point_cache is not None:
+            key = self.point_cache.key(self, in_leads, out_leads,
+                                       self._params(params))
+            cached = self.point_cache.get(key, energy)
+            if cached is not None:
+                return cached
+
+        solution = self._solve(energy, in_leads, out_leads, params, system)
+        con_tot = 0
+        for i in range(0, len(in_leads)):
+            for j in range(len(in_leads), len(in_leads) +
+                           len(out_leads)):
+                con_tot = con_tot + solution.transmission(j, i)
+        if self.point_cache is not None:
+            self.point_cache.put(key, energy, con_tot)
+        return con_tot
+
+    def wavefunction(self, energy, lead, reduce=None, params=None):
+        """Scattering wave functions of the modes incoming from `lead`.
+
+        Calculated on demand and kept in a least recently used cache of
+        :attr:`wavefunction_cache_size` entries, compressed in single
+        precision, see :mod:`garn.wavefunction`.
+
+        Parameters
+        ----------
+        energy : float
+        lead : int
+            Number of the lead in the finalized system.
+        reduce : str, optional
+            "density", "current" or "cross_section", see
+            :func:`~garn.wavefunction.reduce_wavefunction`. Only the
+            reduced result is kept, not the wave functions.
+        params : dict, optional
+            Kwant parameters, missing ones are taken from
+            :attr:`default_params`.
+
+        Returns
+        -------
+        numpy.ndarray
+            Without `reduce` an array of shape (number of modes, number
+            of sites) in complex64, otherwise the reduced float32 array.
+
+        """
+        all_params = self._params(params)
+        key = (float(energy), lead, reduce, tuple(sorted(all_params.items())))
+        if getattr(self, "_wavefunctions", None) is None:
+            self._wavefunctions = WavefunctionCache(
+                self.wavefunction_cache_size)
+        if key not in self._wavefunctions:
+            solver = kwant if self.sparse_solver is None \
+                else self.sparse_solver
+            psi = solver.wave_function(self.sys, energy,
+                                       params=all_params)(lead)
+            if reduce is not None:
+                psi = reduce_wavefunction(psi, reduce, self.sys,
+                                          self._positions(), self.wire_axis,
+                                          all_params)
+            self._wavefunctions.put(key, psi)
+        return self._wavefunctions.get(key)
+
+    def lead_modes(self, energy, lead, params=None):
+        """Propagating modes of `lead` at `energy`.
+
+        Returns
+        -------
+        kwant.physics.PropagatingModes
+            Has the mode wave functions on the lead unit cell, their
+            velocities and momenta.
+
+        """
+        return self.sys.leads[lead].modes(
+            energy, params=self._params(params))[0]
+
+    def export_wavefunctions(self, file_name, energies, lead, reduce=None,
+                             params=None):
+        """Save :meth:`wavefunction` at every energy in `energies`.
+
+        The arrays are written in single precision with
+        numpy.savez_compressed, as `energies` and "wavefunction_0",
+        "wavefunction_1", ... in the order of `energies`.
+        """
+        arrays = {"energies": np.asarray(energies, dtype=float)}
+        for i, energy in enumerate(energies):
+            arrays["wavefunction_" + str(i)] = self.wavefunction(
+                energy, lead, reduce, params)
+        np.savez_compressed(file_name, **arrays)
+
+    def _positions(self):
+        """Positions of the sites of the finalized system."""
+        if getattr(self, "_site_positions", None) is None:
+            self._site_positions = np.array([site.pos for site in
+                                             self.sys.sites])
+        return self._site_positions
+
+    def stream_results(self, file_name, chunk_size=4096):
+        """Keep the points in the binary file `file_name` from now on.
+
+        Calculated points and skipped ranges are appended to a
+        :class:`~garn.stream.PointStream` instead of the text data file,
+        and wire.energies and wire.transmission_data become read only
+        memory mapped views of it. Memory use stays the same however
+        many points are calculated. The views are not sorted, only every
+        chunk of points in them is, see :mod:`garn.stream`; the methods
+        of the wire take care of that.
+
+        Parameters
+        ----------
+        file_name : str
+            If the file exists its points are used and more are appended.
+        chunk_size : int, optional
+            Number of points written at a time.
+
+        Raises
+        ------
+        ValueError
+            If `file_name` holds points of a different wire.
+
+        """
+        header = format_header(self.parameters_names, self.parameters_values)
+        stream = PointStream(file_name, header, chunk_size)
+        if stream.header.split("\n", 1)[1:] != header.split("\n", 1)[1:]:
+            # Only the identifier may differ.
+            raise ValueError(file_name + " holds points of another wire")
+        # Points and skipped ranges from before are moved to the stream.
+        new = set(stream.missing(self.energies, 0))
+        for en, con in zip(self.energies, self.transmission_data):
+            if en in new:
+                stream.append(en, con)
+        skipped = stream.skipped()
+        for start_energy, end_energy, reason in self.skipped:
+            if (start_energy, end_energy, reason) not in skipped:
+                stream.skip(start_energy, end_energy, reason)
+                skipped.append((start_energy, end_energy, reason))
+        self.skipped = skipped
+        self.stream = stream
+        self._merge_points([], [])
+
+    def _solve(self, energy, in_leads, out_leads, params=None, system=None):
+        """Solution of :attr:`solver` at `energy`, see
+        :meth:`_calculate_transmission`."""
+        if system is None and self.share_lead_modes:
+            system = precalculated_system(self.sys, energy,
+                                          self._lead_signatures(),
+                                          self._params(params))
+        elif system is None:
+            system = self.sys
+        if self.solver not in ("smatrix", "greens_function"):
+            raise ValueError("Unknown solver " + str(self.solver))
+        if self.sparse_solver is None:
+            solve = getattr(kwant, self.solver)
+        else:
+            solve = getattr(self.sparse_solver, self.solver)
+        return solve(system, energy, in_leads=in_leads, out_leads=out_leads,
+                     params=self._params(params))
 
     def __eq__(self, other):
         """ Defentition of equality used in testing
@@ -254,7 +978,8 @@ class Wire(object):
         """
         
             
-        if truncate_list(self.transmission_data, 3) == truncate_list(other.transmission_data, 3):
+        if truncate_list(list(self.transmission_data), 3) == \
+                truncate_list(list(other.transmission_data), 3):
             if self.base == other.base:
                 if self.wire_length == other.wire_length:
                     if self.lead_length == other.lead_length:
@@ -263,32 +988,8 @@ class Wire(object):
 
         return False
         
-    def _energy_exist_dialog():
-        """User desides if to overwrite earlier transmission data
-
-        Ask user via terminal prompt if to delete old tranmsiosson and
-        energies or aborth.
-
-        Return
-        ------
-        Bool
-            :code:`True` means user whant to continiue and overwrite old
-            data. :code:`False` means user want to abort transmission
-            function call.
-
-        """
-        print("ERROR: Wire already have saved energies, do you want to delete old energies and continiue? y / n: ")
-        ans = raw_input()
-        if ("y" == ans):
-            print("Call of method Transmission continiued")
-            return True
-        else:
-            print("Call of method Transmission aborted")
-            return False
-
-     
     def transmission_energy_plot(self, title="", save=False,
-                                 file_type="png"):
+                                 file_type="png", show=True):
         """Plot of energy on x - axis against transmission on y - axis
 
         Plots self.energies against self.transmission with some
@@ -302,18 +1003,23 @@ class Wire(object):
            Save the plot with name "figure-" + `self.identifier` + `file_type`
         file_type : str
             Choose file format to save the plot in
+        show : bool
+            Show the plot in a window. Set to False on machines without
+            a display, or use :mod:`garn.plotting` for many wires.
 
         """
-        print(self.energies)
-        print(self.transmission_data)
-        pyplot.plot(self.energies, self.transmission_data)
+        if self.stream is not None:
+            pyplot.plot(*self.stream.sorted())
+        else:
+            pyplot.plot(self.energies, self.transmission_data)
         pyplot.ylabel("Transmission [$e * e / h$]")
 
         pyplot.xlabel("Energy[$hbar squared / 2 m a*a$]")
         pyplot.title(title)
         if save:
             pyplot.savefig("figure-" + self.identifier, format=file_type)
-        pyplot.show()
+        if show:
+            pyplot.show()
 
 
     def _read_file_to_wire(self, file_name):
@@ -336,39 +1042,26 @@ class Wire(object):
         
         with open(file_name, 'r') as f:
             # read wire information from file to list
-            values = []                              
-            for parameter in self.parameters_names:
-                line = f.readline()
-                line = line.split()
-                if(line[0] == (parameter + "=")):
-                    values.append(line[1])
-                else:
-                    print("File: " + file_name + "not correctly formatted")
-                    return
-            for line in f:
-                line2 = line.split()
-                self.energies.append(float(line2[0]))
-                self.transmission_data.append(float(line2[1]))
+            try:
+                values = read_header(f, self.parameters_names)
+            except ValueError:
+                print("File: " + file_name + " not correctly formatted")
+                return
+            energies, transmission_data = read_points(f, self.skipped)
+            # Points added by later calls of transmission are appended
+            # at the end of the file.
+            self._merge_points(energies.tolist(), transmission_data.tolist())
 
         self.identifier = values[0]
-        self.t = float(values[1])
-        # Not yet adjusted for steplength
-        base  = float(values[2]) 
-        wire_length = float(values[3])
-        lead_length = float(values[4])
-
-        self.leads = []
-        for value in values[5:13]:
-            self.leads.append(bool(value))
-
-        # adjust spacial characteristics to the step_length
-        step_length = self.t ** - sqrt(2)
-        scaling_factor = step_length ** -1
+        self.t = values[1]
+        # The sizes are saved in units of the step_length already.
+        self.base = values[2]
+        self.wire_length = values[3]
+        self.lead_length = values[4]
+        self.leads = values[5:13]
+        for name, value in zip(self.parameters_names[13:], values[13:]):
+            setattr(self, name, value)
         self.no_file = False # Not really shure about this parameter.
-        self.base = int(scaling_factor * base)  # width of wire
-        self.wire_length = int(scaling_factor * wire_length)
-        self.lead_length = int(scaling_factor * lead_length)
-                       
 
     def _save_to_file(self, energy, transmission):
         """Save result of calculation to file.
@@ -388,19 +1081,27 @@ class Wire(object):
         instance was initialised with the other parameters any old file with
         with the same name will be overwritten with the new data.
 
+        When streaming the point is appended to :attr:`stream` instead.
+
         """
-                                                     
+        if self.stream is not None:
+            self.stream.append(energy, transmission)
+            return
+        self._write_to_file(format_point(energy, transmission))
+
+    def _write_to_file(self, line):
+        """Append `line` to the data file, writing the header first if
+        the file is new."""
         if self.no_file == True: 
             f = open("data-" + self.identifier, "w")
-            for i in range(len(self.parameters_values)):
-                f.write(self.parameters_names[i] + "= " +
-                        str(self.parameters_values[i]) + "\n")
+            f.write(format_header(self.parameters_names,
+                                  self.parameters_values))
             self.no_file = False
 
         else:
             f = open("data-" + self.identifier, "a")
             #open with "a" for append
                
-        f.write(str(energy) + " " + str(transmission) + "\n")
+        f.write(line)
 
         f.close()
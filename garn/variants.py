@@ -0,0 +1,178 @@
+"""Transmission of many lead configurations of the same Wire3D.
+
+The eight leads of a :class:`~garn.Wire3D` give 256 configurations, 225
+of them with at least one lead at each end. :class:`LeadVariants`
+calculates them from one scattering region in one of two ways.
+
+Exact (the default)
+    The scattering region is built once with
+    :meth:`~garn.Wire3D.scattering_region` and every configuration is a
+    copy of it with its own leads attached, see
+    :meth:`~garn.Wire3D.with_leads`. The lead modes are shared between
+    configurations through :mod:`garn.leads`, so per energy only the
+    scattering problem of every configuration is solved. The results are
+    the same as building every wire from scratch.
+
+Grouped
+    One wire with all eight leads is finalized once and solved once per
+    energy for the transmission from every start lead to every end lead.
+    The transmission of a configuration is the sum over its leads. This
+    is far cheaper, but physically different: leads not in a
+    configuration are still attached and absorb electrons, so the result
+    is the transmission between groups of contacts of the wire with all
+    contacts, not of a wire with only those contacts. With leads on all
+    four sides of both ends no gauge of a magnetic field fits the field
+    free leads, so grouped transmissions need B = 0.
+
+.. code-block:: Python
+
+    variants = garn.variants.LeadVariants(base=3, wire_length=30,
+                                          lead_length=5, grouped=True)
+    curves = variants.transmission(garn.energy_grid.EnergyGrid(0, 1, 100))
+    curves[(True, False, False, False, True, False, False, False)]
+
+"""
+
+import itertools
+
+import numpy as np
+
+from garn.wire_3d import Wire3D
+
+# Names of the lead parameters of Wire3D, in the order of wire.leads.
+lead_names = ["start_top", "start_right", "start_left", "start_bottom",
+              "end_top", "end_right", "end_left", "end_bottom"]
+
+
+def lead_configurations():
+    """Every configuration with at least one lead at each end.
+
+    Returns
+    -------
+    list of tuple of bool
+        225 tuples of eight values in the order of wire.leads.
+    """
+    ends = [leads for leads in itertools.product([False, True], repeat=4)
+            if any(leads)]
+    return [start + end for start in ends for end in ends]
+
+
+def configuration_name(leads):
+    """Short name of a configuration, "1000-1000" for only the top leads."""
+    return ("".join("1" if lead else "0" for lead in leads[:4]) + "-" +
+            "".join("1" if lead else "0" for lead in leads[4:]))
+
+
+class LeadVariants(object):
+    """Lead configurations of one Wire3D sharing its scattering region.
+
+    Parameters
+    ----------
+    configurations : list of list of bool, optional
+        Leads of every configuration, in the order of wire.leads.
+        Defaults to :func:`lead_configurations`.
+    grouped : bool, optional
+        Use one wire with all leads instead of one wire per
+        configuration, see the module documentation for how the results
+        differ.
+    identifier : str, optional
+        Wires of the configurations get this identifier followed by
+        their :func:`configuration_name`.
+    wire_params
+        Other keyword arguments of :class:`~garn.Wire3D`, without the
+        leads.
+
+    """
+
+    def __init__(self, configurations=None, grouped=False,
+                 identifier="variants", **wire_params):
+        self.configurations = [tuple(bool(lead) for lead in leads)
+                               for leads in (configurations or
+                                             lead_configurations())]
+        self.grouped = grouped
+        self.identifier = identifier
+        all_leads = dict((name, True) for name in lead_names)
+        self.wire = Wire3D(identifier=identifier, **dict(wire_params,
+                                                         **all_leads))
+        self._region = None
+
+    def wires(self):
+        """Finalized wire of every configuration, made one at a time.
+
+        Only used when not grouped.
+        """
+        if self._region is None:
+            self._region = self.wire.scattering_region()
+        for leads in self.configurations:
+            wire = self.wire.with_leads(
+                leads, self.identifier + "-" + configuration_name(leads),
+                self._region)
+            # The configurations have the same leads, so their modes are
+            # calculated once per energy.
+            wire.share_lead_modes = True
+            yield wire
+
+    def transmission(self, energies, params=None, **options):
+        """Transmission of every configuration at `energies`.
+
+        Parameters
+        ----------
+        energies : :class:`~garn.energy_grid.EnergyGrid` or list of float
+        params : dict, optional
+            Kwant parameters, only used when grouped. The wires of exact
+            configurations use :attr:`~garn.system_wide.Wire.default_params`.
+        options
+            Keyword arguments of
+            :meth:`~garn.system_wide.Wire.transmission`, used for every
+            wire when not grouped. Every wire saves its points as usual.
+
+        Returns
+        -------
+        dict
+            numpy.ndarray of the transmission at `energies` for every
+            configuration, NaN at energies left out by
+            `skip_below_onset` or `stop_after_plateaus`.
+
+        """
+        energies = list(energies)
+        if self.grouped:
+            return self._grouped_transmission(energies, params)
+
+        options.setdefault("print_to_commandline", False)
+        curves = {}
+        for wire in self.wires():
+            wire.transmission(energies=energies, **options)
+            calculated = dict(zip(wire.energies, wire.transmission_data))
+            curves[tuple(wire.leads)] = np.array(
+                [calculated.get(en, np.nan) for en in energies])
+        return curves
+
+    def transmission_matrices(self, energies, params=None):
+        """Transmission from every start lead to every end lead of the wire
+        with all leads.
+
+        Returns
+        -------
+        numpy.ndarray
+            Shape (len(`energies`), 4, 4), element [e, i, j] is the
+            transmission from start lead i to end lead j at energy e.
+
+        """
+        in_leads, out_leads = self.wire._in_out_nums()
+        matrices = np.zeros((len(energies), len(in_leads), len(out_leads)))
+        for e, energy in enumerate(energies):
+            solution = self.wire._solve(energy, in_leads, out_leads, params)
+            for i, in_lead in enumerate(in_leads):
+                for j, out_lead in enumerate(out_leads):
+                    matrices[e, i, j] = solution.transmission(out_lead,
+                                                              in_lead)
+        return matrices
+
+    def _grouped_transmission(self, energies, params):
+        matrices = self.transmission_matrices(energies, params)
+        curves = {}
+        for leads in self.configurations:
+            start = np.array(leads[:4])
+            end = np.array(leads[4:])
+            curves[leads] = matrices[:, start][:, :, end].sum(axis=(1, 2))
+        return curves
@@ -0,0 +1,160 @@
+"""Scattering wave functions calculated on demand.
+
+A wave function of a Wire3D has one complex number per site for every
+incoming mode, which is far too much to keep for every energy of a
+sweep. :meth:`~garn.system_wide.Wire.wavefunction` therefore calculates
+it only when asked for, optionally reduces it right away to a density
+or current, and keeps the most recent results in a
+:class:`WavefunctionCache` as zlib compressed single precision arrays.
+
+.. code-block:: Python
+
+    psi = wire.wavefunction(0.8, lead=0)
+    density = wire.wavefunction(0.8, lead=0, reduce="density")
+    profile = wire.wavefunction(0.8, lead=0, reduce="cross_section")
+
+"""
+
+import collections
+import zlib
+
+import kwant
+import numpy as np
+
+# Reductions understood by reduce_wavefunction.
+reductions = ["density", "current", "cross_section"]
+
+
+class CompressedArray(object):
+    """Array kept zlib compressed in single precision.
+
+    Complex arrays are stored as complex64 and real ones as float32, so
+    a round trip loses everything beyond about seven digits.
+    """
+
+    def __init__(self, array, level=1):
+        array = np.asarray(array)
+        if np.iscomplexobj(array):
+            array = array.astype(np.complex64)
+        else:
+            array = array.astype(np.float32)
+        self.shape = array.shape
+        self.dtype = array.dtype
+        self.data = zlib.compress(np.ascontiguousarray(array).tobytes(),
+                                  level)
+
+    @property
+    def nbytes(self):
+        """Size of the compressed data in bytes."""
+        return len(self.data)
+
+    def array(self):
+        """The stored array, decompressed."""
+        return np.frombuffer(zlib.decompress(self.data),
+                             self.dtype).reshape(self.shape)
+
+
+class WavefunctionCache(object):
+    """Least recently used cache of :class:`CompressedArray` values.
+
+    Parameters
+    ----------
+    size : int
+        Largest number of arrays kept.
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.arrays = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def __len__(self):
+        return len(self.arrays)
+
+    def get(self, key):
+        """Decompressed array stored for `key`, None if there is none."""
+        if key not in self.arrays:
+            return None
+        self.arrays.move_to_end(key)
+        return self.arrays[key].array()
+
+    def put(self, key, array):
+        self.arrays[key] = CompressedArray(array)
+        self.arrays.move_to_end(key)
+        while len(self.arrays) > self.size:
+            self.arrays.popitem(last=False)
+
+    def clear(self):
+        self.arrays.clear()
+
+
+def cross_section_average(density, positions, axis):
+    """Average of `density` over every cross-section of the wire.
+
+    Parameters
+    ----------
+    density : numpy.ndarray
+        One value per site.
+    positions : numpy.ndarray
+        Site positions, shape (number of sites, dimensions).
+    axis : int
+        Coordinate along the wire.
+
+    Returns
+    -------
+    (coordinates, averages) : tuple of numpy.ndarray
+        Sorted coordinates along the wire and the mean density of the
+        sites at each.
+
+    """
+    coordinates, inverse = np.unique(positions[:, axis],
+                                     return_inverse=True)
+    sums = np.bincount(inverse, weights=density)
+    counts = np.bincount(inverse)
+    return coordinates, sums / counts
+
+
+def reduce_wavefunction(psi, reduce, system, positions=None, axis=None,
+                        params=None):
+    """Reduce the wave functions `psi` of all modes of one lead.
+
+    Parameters
+    ----------
+    psi : numpy.ndarray
+        Shape (number of modes, number of sites), as returned by
+        kwant.wave_function.
+    reduce : str
+        "density" for the probability density summed over the modes,
+        "current" for the current through every hopping of `system`
+        summed over the modes, "cross_section" for the density averaged
+        over the cross-sections along the wire.
+    system : kwant FiniteSystem
+    positions : numpy.ndarray, optional
+        Site positions, needed for "cross_section".
+    axis : int, optional
+        Coordinate along the wire, needed for "cross_section".
+    params : dict, optional
+        Kwant parameters, needed for "current".
+
+    Returns
+    -------
+    numpy.ndarray
+        One value per site or hopping. For "cross_section" an array with
+        two rows, the coordinates and the averages.
+
+    """
+    if reduce not in reductions:
+        raise ValueError("Unknown reduction " + str(reduce))
+    if reduce == "current":
+        current = kwant.operator.Current(system)
+        total = np.zeros(system.graph.num_edges)
+        for mode in psi:
+            total = total + current(mode, params=params)
+        return total
+    density = np.sum(np.abs(psi) ** 2, axis=0)
+    if reduce == "density":
+        return density
+    return np.array(cross_section_average(density, positions, axis))
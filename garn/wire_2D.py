@@ -1,5 +1,6 @@
 import kwant
-from math import sqrt
+from math import sqrt, pi
+import numpy as np
 from matplotlib import pyplot
 
 from garn.geometry import rectangle
@@ -11,13 +12,14 @@ class Wire2D(Wire):
     Kwant by actings as a help in constructing a 2D projection of a
     nanowire and attaching customizabel contacts in each end.
     """
-    
-    
+
+    # The wire runs along x.
+    wire_axis = 0
     
     def __init__(self, base=3, wire_length=30, lead_length=5,
         identifier="unnamed", file_name="", step_length=1,
         start_right=True, start_left=True, end_right=True,
-        end_left=True):
+        end_left=True, database="", point_cache=None):
                  
         """A Instance of Wire2D describes the properties of a 2D nanowire
 
@@ -60,6 +62,13 @@ class Wire2D(Wire):
             the end of the wire (default True)
         file_name : str, optional
             Uses the data-file specified by the str to create a the instance
+        database : str, optional
+            Uses the wire with `identifier` stored in the SQLite file
+            specified by the str to create the instance, see
+            :class:`~garn.database.ResultsDatabase`.
+        point_cache : :class:`~garn.point_cache.PointCache`, optional
+            Cache of transmission points shared with other wires and
+            processes.
 
         """
         Wire.__init__(self, base=base, wire_length=wire_length,
@@ -69,7 +78,8 @@ class Wire2D(Wire):
                       start_left=start_left,
                       start_bottom=False, end_top=False,
                       end_right=end_right, end_left=end_left,
-                      end_bottom=False)
+                      end_bottom=False, database=database,
+                      point_cache=point_cache)
 
         # Set lattice vectors for lattice object
         basis_vectors = ((self.a, 0), (0, self.a))
@@ -94,7 +104,7 @@ class Wire2D(Wire):
        
         
         # Set hoppings between those sites.
-        self.sys[self.lattice.neighbors()] = -self.t
+        self.sys[self.lattice.neighbors()] = self._hopping
         
         lead_start, lead_end = self._create_leads()
         
@@ -136,9 +146,22 @@ class Wire2D(Wire):
         else:
             return False         
                          
-    def _onsite(self, args):
-        """ Retrive onsite value of sites"""
-        return 4 * self.t
+    def _onsite(self, site, gate):
+        """ Retrive onsite value of sites shifted by the gate potential"""
+        return 4 * self.t + gate
+
+    def _hopping(self, site1, site2, B):
+        """Hopping in the scattering region with Peierls phase.
+
+        `B` is the magnetic field perpendicular to the plane in flux
+        quanta :math:`h/e` per lattice plaquette, in the gauge
+        :math:`A = (0, Bx)`. The leads are field free and attached along
+        y, so hoppings along x, the only ones on the lead interfaces,
+        have no phase.
+        """
+        x1, y1 = site1.pos
+        x2, y2 = site2.pos
+        return - self.t * np.exp(-1j * pi * B * (x1 + x2) * (y1 - y2))
                  
     def _create_leads(self):
         """ Return leads of system ready to be attached"""
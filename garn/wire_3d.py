@@ -1,9 +1,15 @@
+import copy
+
 import kwant
-from math import sqrt
+from math import sqrt, pi
 from matplotlib import pyplot
 import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
 
-from garn.geometry import hexagon, extension
+from garn.geometry import cross_section_mask
+from garn.leads import shared_builder
+from garn.memory import low_memory_solver, resident_memory
 from garn.system_wide import Wire
 
 
@@ -15,12 +21,14 @@ class Wire3D(Wire):
 
     """
 
+    parameters_names = Wire.parameters_names + ["shape"]
     
     def __init__(self, base=3, wire_length=30, lead_length=5,
                  identifier="unnamed", file_name="", step_length=1,
                  start_top=True, start_right=True, start_left=True,
                  start_bottom=False, end_top=True, end_right=True,
-                 end_left=True, end_bottom=False):
+                 end_left=True, end_bottom=False, database="",
+                 low_memory=False, shape="hexagon", point_cache=None):
 
         """A Instance of Wire3D describes the properties of a 3D nanowire
  
@@ -69,12 +77,40 @@ class Wire3D(Wire):
             the end of the wire.
         end_bottom : bool, optional
             Boolian vaules of there should be a lead on the bottom at
-            the end of the wire.
+            the end of the wire. A magnetic field B other than 0
+            needs at least one side of each end without a lead.
         file_name : str, optional
             Uses the data-file specified by the str to create a the
             instance.
+        database : str, optional
+            Uses the wire with `identifier` stored in the SQLite file
+            specified by the str to create the instance, see
+            :class:`~garn.database.ResultsDatabase`.
+        shape : str, optional
+            Cross-section of the wire, any name registered with
+            :func:`~garn.geometry.register_shape`: "hexagon",
+            "circle", "triangle" or "core_shell" by default. `base` is
+            the size of the cross-section.
+        point_cache : :class:`~garn.point_cache.PointCache`, optional
+            Cache of transmission points shared with other wires and
+            processes.
+        low_memory : bool, optional
+            Solve with :func:`~garn.memory.low_memory_solver`, the MUMPS
+            options needing the least memory, at the cost of speed, and
+            do not keep the lead builders in the cache shared between
+            wires. The system itself is built as usual. Compare
+            :func:`garn.scaling.measure` of the wire with and without it,
+            each runs in a fresh process, to see what it saves.
+
+        Attributes
+        ----------
+        construction_memory : float or None
+            Growth in MB of the resident memory of the process while
+            this wire was built, see
+            :func:`~garn.memory.resident_memory`.
 
         """
+        self.shape = shape
         Wire.__init__(self, base=base, wire_length=wire_length,
                       lead_length=lead_length, identifier=identifier,
                       file_name=file_name, step_length=step_length,
@@ -82,12 +118,20 @@ class Wire3D(Wire):
                       start_left=start_left,
                       start_bottom=start_bottom, end_top=end_top,
                       end_right=end_right, end_left=end_left,
-                      end_bottom=end_bottom)
+                      end_bottom=end_bottom, database=database,
+                      point_cache=point_cache)
     
 
         
         self.lattice = self._lattice()
+        self.cross_section = cross_section_mask(self.shape, self.base)
+        self.low_memory = low_memory
+        if low_memory:
+            self.sparse_solver = low_memory_solver()
+        before = resident_memory()
         self._make_system()
+        self.construction_memory = (None if before is None else
+                                    resident_memory() - before)
 
 
 #---------------------------------------------------------------------
@@ -150,12 +194,16 @@ class Wire3D(Wire):
         """
 
         #add sites in scattering region
-        self.sys[self.lattice.shape(
-            self._hexagon_wire, (0, 0, 0))] = self._onsite
+        self.sys[self._wire_sites()] = self._onsite
 
         
-        self.sys[self.lattice.neighbors()] = - self.t
-        
+        self.sys[self.lattice.neighbors()] = self._hopping
+
+        self._attach_and_finalize()
+
+    def _attach_and_finalize(self):
+        """Attach the leads in self.leads to the scattering region in
+        self.sys and finalize it."""
         lead_start_top, lead_end_top = self._create_leads((0, 0, self.a))
         lead_start_side, lead_end_side = self._create_leads((self.a, 0, 0))
 
@@ -165,16 +213,77 @@ class Wire3D(Wire):
         #self.system_plot()
 
         self.sys = self.sys.finalized()
+        self._chi = None
 
 
-    def _hexagon_wire(self, pos):
-        """ Find out if the position is inside a hexagonal wire."""
-        x, y, z = pos
-        if (hexagon((x, z), self.base) & (y >= 0) & (y < self.wire_length)):
-            return True
-        else:
-            return False
+    def scattering_region(self):
+        """New Builder holding only the scattering region of the wire.
 
+        Used with :meth:`with_leads` to build many wires with different
+        leads from one scattering region.
+        """
+        region = kwant.Builder()
+        region[self._wire_sites()] = self._onsite
+        region[self.lattice.neighbors()] = self._hopping
+        return region
+
+    def with_leads(self, leads, identifier=None, region=None):
+        """Copy of the wire with other leads.
+
+        Parameters
+        ----------
+        leads : list of bool (length 8)
+            Same order as the attribute leads.
+        identifier : str, optional
+            Defaults to the identifier of this wire.
+        region : kwant.Builder, optional
+            :meth:`scattering_region` of this wire. Pass the same one for
+            many copies, so the sites and hoppings of the scattering
+            region are made only once.
+
+        Returns
+        -------
+        :class:`~garn.Wire3D`
+            Finalized wire without calculated points.
+
+        """
+        if region is None:
+            region = self.scattering_region()
+        wire = copy.copy(self)
+        wire.leads = list(leads)
+        wire.identifier = identifier or self.identifier
+        wire.energies = []
+        wire.transmission_data = []
+        wire.skipped = []
+        wire.no_file = True
+        wire.stream = None
+        wire._signatures = None
+        wire._wavefunctions = None
+        wire._site_positions = None
+        wire.parameters_values = ((wire.identifier,) +
+                                  tuple(self.parameters_values[1:5]) +
+                                  tuple(wire.leads) +
+                                  tuple(self.parameters_values[13:]))
+        wire.sys = kwant.Builder()
+        wire.sys.update(region)
+        # The Peierls phases depend on the leads, see _gauge.
+        wire.sys[list(region.hoppings())] = wire._hopping
+        wire._attach_and_finalize()
+        return wire
+
+    def _wire_sites(self):
+        """Generate the sites of the wire one by one.
+
+        The cross-section is the same for every y, so it is calculated
+        once by :func:`~garn.geometry.cross_section_mask` and extruded along
+        the wire. The sites are streamed in instead of flood filling a
+        shape, which keeps every visited site in memory.
+        """
+        xs, zs = self.cross_section
+        cross_section = list(zip(xs.tolist(), zs.tolist()))
+        for y in range(self.wire_length):
+            for x, z in cross_section:
+                yield self.lattice(x, y, z)
 
     def _positions_of_leads(self):
         """Calculate positions from where to start fill leads
@@ -221,26 +330,135 @@ class Wire3D(Wire):
         # return the lattice object
         return kwant.lattice.Monatomic(basis_vectors)
 
-    def _onsite(self, args):
+    def _onsite(self, site, gate):
+        """Onsite value in the scattering region shifted by the gate
+        potential `gate`."""
         # +  kwant.digest.gauss(str(site.pos))
-        return 6 * self.t
+        return 6 * self.t + gate
+
+    def _hopping(self, site1, site2, B):
+        """Hopping in the scattering region with Peierls phase.
+
+        `B` is the magnetic field along the wire (y-direction) in flux
+        quanta :math:`h/e` per lattice plaquette, in the gauge
+        :math:`A = (Bz, 0, 0)` transformed by :meth:`_gauge` to fit the
+        field free leads.
+        """
+        if B == 0:
+            return - self.t + 0j
+        split, chi = self._gauge()
+        x1, y1, z1 = site1.tag
+        x2, y2, z2 = site2.tag
+        phase = ((x1 - x2) * (z1 + z2) / 2.0 +
+                 chi[y1 >= split].get((x1, z1), 0) -
+                 chi[y2 >= split].get((x2, z2), 0))
+        return - self.t * np.exp(-2j * pi * B * phase)
+
+    def _gauge(self):
+        """Gauge transformation of the magnetic field fitting the leads.
+
+        The leads are field free, and the hoppings kwant takes from them,
+        in the lead padding and from the lead to its interface, have no
+        Peierls phase. So the vector potential along every lead interface
+        has to vanish and the flux through plaquettes touching the
+        padding has to be zero, otherwise the field jumps to a large flux
+        there. Starting from :math:`A = (Bz, 0, 0)` a function chi of the
+        position in the cross-section, added to the phases like
+        :math:`\\nabla \\chi`, is fitted to these conditions by least
+        squares, once for each end of the wire.
+
+        Returns
+        -------
+        (split, chi) : tuple of int and tuple of dict
+            chi[0] holds chi(x, z), in units of :math:`B`, of the sites
+            with y below `split` and chi[1] of the others.
+
+        Raises
+        ------
+        ValueError
+            If no gauge fits the leads, for example with leads on all four
+            sides of one end, which leaves no place for the flux through
+            the cross-section to enter.
+
+        """
+        if getattr(self, "_chi", None) is not None:
+            return self._chi
+
+        xs, zs = self.cross_section
+        region = set(zip(xs.tolist(), zs.tolist()))
+        # Pads and interface sites of the leads at every end, as (x, z).
+        ends = [(set(), []), (set(), [])]
+        overlap = self.wire_length < 2 * self.lead_length
+        attached = [i for i, lead in enumerate(self.leads) if lead]
+        for k, i in enumerate(attached):
+            pads, interfaces = ends[0 if overlap else i // 4]
+            pads.update((self.sys.sites[j].tag[0], self.sys.sites[j].tag[2])
+                        for j in self.sys.lead_paddings[k])
+            interfaces.append(set((self.sys.sites[j].tag[0],
+                                   self.sys.sites[j].tag[2])
+                                  for j in self.sys.lead_interfaces[k]))
+
+        index = dict((site, n) for n, site in enumerate(sorted(region)))
+        chi = []
+        for pads, interfaces in ends:
+            rows, columns, values, rhs = [], [], [], []
+
+            def add(row, a, b):
+                # Phase from a to b, if the hopping belongs to the wire.
+                if a in region and b in region:
+                    rows.extend([row, row])
+                    columns.extend([index[b], index[a]])
+                    values.extend([1.0, -1.0])
+                    rhs[row] = rhs[row] - a[1] * (b[0] - a[0])
+
+            for x, z in region | pads:
+                loop = [(x, z), (x + 1, z), (x + 1, z + 1), (x, z + 1)]
+                if (all(corner in region or corner in pads
+                        for corner in loop) and
+                        any(corner in pads for corner in loop)):
+                    rhs.append(0.0)
+                    for a, b in zip(loop, loop[1:] + loop[:1]):
+                        add(len(rhs) - 1, a, b)
+            for interface in interfaces:
+                for x, z in interface:
+                    for b in [(x + 1, z), (x, z + 1)]:
+                        if b in interface:
+                            rhs.append(0.0)
+                            add(len(rhs) - 1, (x, z), b)
+
+            solution = np.zeros(len(index))
+            if rhs:
+                matrix = scipy.sparse.csr_matrix(
+                    (values, (rows, columns)), shape=(len(rhs), len(index)))
+                solution = scipy.sparse.linalg.lsqr(matrix, rhs, atol=1e-14,
+                                                    btol=1e-14)[0]
+                if np.max(np.abs(matrix.dot(solution) - rhs)) > 1e-8:
+                    raise ValueError("No gauge of the magnetic field fits "
+                                     "the leads " + str(self.leads))
+            chi.append(dict((site, solution[n]) for site, n in index.items()
+                            if solution[n] != 0))
+
+        split = self.wire_length if overlap else self.wire_length // 2
+        self._chi = (split, tuple(chi))
+        return self._chi
 
         
     def _fill_lead(self, lead, position, side=False):
         x, y, z = position
                 
-        start_x  = -self.base + 1
+        # The leads cover the extent of the cross-section in x (top) or
+        # z (side).
+        xs, zs = self.cross_section
         if not side:
-            lead[[self.lattice(i, j, 0) for i in range(-self.base+1,
-                                                       self.base) for j in range(y, y +
-                                                                                 self.lead_length)]] = 6 * self.t
+            lead[(self.lattice(i, j, 0) for i in range(int(xs.min()),
+                                                       int(xs.max()) + 1) for j in range(y, y +
+                                                                                 self.lead_length))] = 6 * self.t
             return lead
 
         if side:
-            lead[[self.lattice(0, j, k) for j in
+            lead[(self.lattice(0, j, k) for j in
                   range(y, y + self.lead_length) for k in
-                  range(int(-self.base * sqrt(3) / 2.0),
-                        int(self.base * sqrt(3) / 2.0)+1)]] = 6 * self.t
+                  range(int(zs.min()), int(zs.max()) + 1))] = 6 * self.t
             return lead
             
 
@@ -253,16 +471,22 @@ class Wire3D(Wire):
         else:
             side = False
 
-        lead_start = kwant.Builder(
-            kwant.TranslationalSymmetry(sym))
-        lead_end = kwant.Builder(
-            kwant.TranslationalSymmetry(sym))
-
         pos_start, pos_end = self._positions_of_leads()
-        lead_end = self._fill_lead(lead_end, pos_end, side)
-        lead_start = self._fill_lead(lead_start, pos_start, side)
 
-        lead_end[self.lattice.neighbors()] = -self.t
-        lead_start[self.lattice.neighbors()] = -self.t
+        def make(position):
+            lead = kwant.Builder(kwant.TranslationalSymmetry(sym))
+            lead = self._fill_lead(lead, position, side)
+            lead[self.lattice.neighbors()] = -self.t
+            return lead
 
-        return lead_start, lead_end
+        if self.low_memory:
+            return make(pos_start), make(pos_end)
+
+        # Equal leads are shared between wires, for example the start
+        # leads of every wire in a length sweep.
+        leads = []
+        for position in (pos_start, pos_end):
+            key = ("Wire3D", self.shape, self.base, self.lead_length, self.t,
+                   sym, position)
+            leads.append(shared_builder(key, make, position))
+        return leads[0], leads[1]
@@ -0,0 +1,32 @@
+from context import garn
+
+# The shared executor spawns its workers, which import the main module
+# again, so everything runs under the guard. Run by simple_test.py.
+
+
+def shared_test():
+    """Transmission with executor="shared" against the serial sweep for
+    both solvers, return bool"""
+    for wire_class in [garn.Wire2D, garn.Wire3D]:
+        for solver in ["smatrix", "greens_function"]:
+            results = []
+            for workers, executor in [(1, "thread"), (2, "shared")]:
+                wire = wire_class(base=3, wire_length=30, lead_length=5,
+                                  identifier="simple-test-shared")
+                wire.no_file = True
+                wire.solver = solver
+                wire.transmission(0, 1, 10, print_to_commandline=False,
+                                  workers=workers, executor=executor)
+                results.append(list(wire.transmission_data))
+            serial, shared = results
+            if len(shared) != 10 or any(abs(a - b) > 1e-9
+                                        for a, b in zip(serial, shared)):
+                return False
+    return True
+
+
+if __name__ == "__main__":
+    if shared_test():
+        print("Shared executor test... Passed")
+    else:
+        print("Shared executor test... Failed")